@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Benchmark Suite
+
+Runs a corpus of patterns, from plain literals to pathological backtracking
+cases, over generated log text of every size on every engine and on re, and
+reports operations per second, the latency of single calls at the 50th, 90th
+and 99th percentiles and the peak memory of a call. Pathological cases run on
+short inputs of their own, with a timeout.
+The results can be written as JSON, to compare runs against each other.
+Run it with python -m benchmarks.
+
+Usage:
+    benchmarks [options]
+
+Options:
+    --sizes=<sizes>      Input sizes, with K and M for kilobytes and
+                         megabytes, up to 100M [default: 1K,100K].
+    --engines=<engines>  Engines to run, re for the stdlib module
+                         [default: re,backtrack,nfa,dfa,vm].
+    --time=<seconds>     Time spent calling each case [default: 0.5].
+    --timeout=<seconds>  Limit of one backtracking call [default: 2].
+    --output=<path>      Write the results as JSON to this file.
+"""
+
+import json
+import re
+import sys
+from random import Random
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from docopt import docopt
+
+import regex
+
+
+# name, pattern, method and the input of cases without a size of their own;
+# the parser has no groups, so nested quantifiers are adjacent ones
+CASES = [
+    ('literal', r'peter_hunt', 'findall', None),
+    ('counted', r'\d{3,4}-\d{4}', 'findall', None),
+    ('words', r'\w+@\w+\.com', 'findall', None),
+    ('quantifiers', r'[a-z]+\d*[a-z]*\s', 'findall', None),
+    ('backtracking', r'\w*\d*\w*\d*!', 'match', '1234567890' * 3 + '?'),
+    ('possessive', r'\w*+\d*+\w*+\d*+!', 'match', '1234567890' * 3 + '?'),
+]
+UNITS = {'K': 1 << 10, 'M': 1 << 20}
+PERCENTILES = [50, 90, 99]
+
+
+def parse_size(size):
+    if size[-1:].upper() in UNITS:
+        return int(size[:-1]) * UNITS[size[-1].upper()]
+    return int(size)
+
+
+def make_text(size):
+    rng = Random(0)
+    words = ['peter_hunt', 'GET', 'POST', 'index', 'api', 'ok', 'error']
+    lines = []
+    length = 0
+    while length < size:
+        line = (f'{rng.randrange(100, 10000)}-{rng.randrange(1000, 10000)} '
+                f'{rng.choice(words)} {rng.choice(words)}{rng.randrange(99)}'
+                f' {rng.choice(words)}@example.com\n')
+        lines.append(line)
+        length += len(line)
+    return ''.join(lines)[:size]
+
+
+def percentile(times, rank):
+    # nearest rank of the sorted times
+    return times[max(0, -(-len(times) * rank // 100) - 1)]
+
+
+def measure(func, string, seconds):
+    times = []
+    began = perf_counter()
+    while not times or perf_counter() - began < seconds:
+        before = perf_counter()
+        func(string)
+        times.append(perf_counter() - before)
+    elapsed = perf_counter() - began
+    times.sort()
+
+    start()
+    func(string)
+    peak = get_traced_memory()[1]
+    stop()
+
+    result = {
+        'calls': len(times),
+        'ops_per_sec': len(times) / elapsed,
+        'peak_memory': peak,
+    }
+    for rank in PERCENTILES:
+        result[f'p{rank}'] = percentile(times, rank)
+    return result
+
+
+def run_case(name, pattern, method, string, engine, seconds, timeout):
+    result = {'case': name, 'pattern': pattern, 'method': method,
+              'size': len(string), 'engine': engine}
+    try:
+        if engine == 're':
+            func = getattr(re.compile(pattern), method)
+        else:
+            func = getattr(regex.compile(pattern, engine=engine), method)
+            if method != 'findall':
+                def func(string, func=func):
+                    return func(string, timeout=timeout)
+        result.update(measure(func, string, seconds))
+    except regex.error as exc:
+        # possessive repeats on the automata, or a call out of time
+        result['error'] = str(exc)
+    return result
+
+
+def report(result):
+    name = (f'{result["case"]:<14}{result["size"]:>10}'
+            f'{result["engine"]:>11}')
+    if 'error' in result:
+        print(f'{name}  {result["error"]}')
+        return
+    print(f'{name}{result["ops_per_sec"]:>12.1f}'
+          + ''.join(f'{result[f"p{rank}"] * 1e3:>10.3f}ms'
+                    for rank in PERCENTILES)
+          + f'{result["peak_memory"] / 1024:>10.1f}KB')
+
+
+def main(argv=None):
+    args = docopt(__doc__, argv)
+    sizes = [parse_size(size) for size in args['--sizes'].split(',')]
+    engines = args['--engines'].split(',')
+    seconds = float(args['--time'])
+    timeout = float(args['--timeout'])
+
+    print(f'{"case":<14}{"size":>10}{"engine":>11}{"ops/sec":>12}'
+          + ''.join(f'{f"p{rank}":>12}' for rank in PERCENTILES)
+          + f'{"peak":>12}')
+    results = []
+    for size in sizes:
+        text = make_text(size)
+        for name, pattern, method, string in CASES:
+            if string is not None and size != sizes[0]:
+                continue
+            for engine in engines:
+                result = run_case(name, pattern, method,
+                                  text if string is None else string,
+                                  engine, seconds, timeout)
+                report(result)
+                results.append(result)
+
+    if args['--output']:
+        with open(args['--output'], 'w') as file:
+            json.dump({
+                'python': sys.version,
+                'regex': regex.__version__,
+                'results': results,
+            }, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
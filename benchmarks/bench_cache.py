@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Compile Cache
+
+Compiles a small set of hot patterns mixed with a stream of patterns that are
+only ever seen once, as when patterns come from configuration, and reports
+how often the hot ones were found in the cache.
+
+Usage:
+    python -m benchmarks.bench_cache
+"""
+
+from random import Random
+from time import perf_counter
+
+from regex import cache_info, compile, purge, set_cache_size
+
+
+HOT = [rf'\w+ {number} \d+?' for number in range(32)]
+CACHE_SIZES = [64, 128, 512]
+CALLS = 20000
+
+
+def main():
+    print(f'{"cache size":<12}{"hit rate":>10}{"evictions":>11}'
+          f'{"per call":>12}')
+    default = cache_info()['max_size']
+    for size in CACHE_SIZES:
+        purge()
+        set_cache_size(size)
+        rng = Random(0)
+        start = perf_counter()
+        for number in range(CALLS):
+            if rng.random() < 0.8:
+                compile(rng.choice(HOT))
+            else:
+                compile(rf'\d+ once {number}')
+        elapsed = perf_counter() - start
+        info = cache_info()
+        rate = info['hits'] / (info['hits'] + info['misses'])
+        print(f'{size:<12}{rate:>10.1%}{info["evictions"]:>11}'
+              f'{elapsed / CALLS * 1e6:>10.2f}us')
+    purge()
+    set_cache_size(default)
+
+
+if __name__ == '__main__':
+    main()
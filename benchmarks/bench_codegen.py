@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Generated Source
+
+Times log parsing patterns on the backtracker before and after they have been
+used CODEGEN_THRESHOLD times, when they switch from walking the node tree to
+running the Python function generated for them.
+
+Usage:
+    python -m benchmarks.bench_codegen
+"""
+
+from timeit import repeat
+
+from regex import compile, CODEGEN_THRESHOLD
+
+
+CASES = [
+    ('match', r'^\w+ \d+?', 'peter_hunt 123'),
+    ('match', r'\d+\.\d+\.\d+\.\d+ ', '192.168.0.1 - - GET /index.html'),
+    ('search', r'\d+ms', 'GET /index.html 200 took 125ms'),
+    ('search', r'ERROR \w+', '2024-01-01 12:00:00 ERROR timeout'),
+    ('search', r'\w+@\w+\.com', 'mail peter_hunt@example.com now'),
+]
+
+
+def best_of(func, number):
+    return min(repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print(f'{"pattern":<24}{"cold":>12}{"hot":>12}{"speedup":>10}')
+    for method, raw, string in CASES:
+        # the first calls run on the node tree, every call after them runs
+        # the generated function
+        compiled = compile(raw, engine='backtrack')
+        func = getattr(compiled, method)
+        cold_time = min(repeat(lambda: func(string), number=1,
+                               repeat=CODEGEN_THRESHOLD - 1))
+        func(string)
+        assert compiled.source is not None, raw
+        hot_time = best_of(lambda: func(string), 1000)
+
+        print(f'{raw:<24}{cold_time * 1e6:>10.2f}us{hot_time * 1e6:>10.2f}us'
+              f'{cold_time / hot_time:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Disk Cache
+
+Times compiling a few thousand generated patterns by parsing them and by
+loading their nodes from a cache written by an earlier run, as a worker that
+starts cold does with enable_disk_cache.
+
+Usage:
+    python -m benchmarks.bench_diskcache
+"""
+
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from regex import compile, disable_disk_cache, enable_disk_cache, purge
+
+
+PATTERNS = [rf'^GET /api/v{number}/\w+/\d{{1,8}} [a-z_\d]+\s+\S+$'
+            for number in range(2000)]
+
+
+def compile_all():
+    purge()
+    start = perf_counter()
+    for pattern in PATTERNS:
+        compile(pattern)
+    return perf_counter() - start
+
+
+def main():
+    parsed = compile_all()
+    with TemporaryDirectory() as path:
+        enable_disk_cache(path)
+        written = compile_all()
+        loaded = compile_all()
+        disable_disk_cache()
+    purge()
+    print(f'{len(PATTERNS)} patterns')
+    print(f'{"parsed":<10}{parsed * 1e3:>10.1f}ms')
+    print(f'{"written":<10}{written * 1e3:>10.1f}ms')
+    print(f'{"loaded":<10}{loaded * 1e3:>10.1f}ms'
+          f'{parsed / loaded:>8.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Benchmark for finditer Memory Use
+
+Counts the matches finditer yields over inputs with up to 10^6 of them and
+records the peak memory allocated while doing so. The input itself is built
+before tracing starts, so a lazy scan should peak at the same few kilobytes
+whatever the number of matches.
+
+Usage:
+    python -m benchmarks.bench_finditer
+"""
+
+from time import perf_counter
+from tracemalloc import get_traced_memory, start, stop
+
+from regex import compile
+
+
+COUNTS = [10 ** 4, 10 ** 5, 10 ** 6]
+ENGINES = ['dfa', 'nfa', 'backtrack']
+
+
+def main():
+    print(f'{"engine":<11}{"matches":>9}{"time":>10}{"peak":>12}')
+    for engine in ENGINES:
+        compiled = compile(r'\d+', engine=engine)
+        for count in COUNTS:
+            string = 'ab 12 ' * count
+
+            start()
+            begin = perf_counter()
+            found = sum(1 for _ in compiled.finditer(string))
+            elapsed = perf_counter() - begin
+            peak = get_traced_memory()[1]
+            stop()
+
+            assert found == count, (found, count)
+            print(f'{engine:<11}{count:>9}{elapsed:>9.2f}s'
+                  f'{peak / 1024:>10.1f}KB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Optimizer
+
+Compares patterns built from the nodes as parsed against the nodes the
+optimizer leaves, which fuses repeats of one character, merges literals and
+lets the backtracker skip stops that leave too little for the rest of the
+pattern. Generating source for hot backtrack patterns is turned off, so the
+backtracker walks its tree.
+
+Usage:
+    python -m benchmarks.bench_optimize
+"""
+
+import sys
+from timeit import repeat
+
+import regex.pattern
+from regex.pattern import Pattern, _optimized, _parse
+
+
+CASES = [
+    ('match', r'a*a*a*b', 'a' * 20),
+    ('match', r'\d\d*\d?-\d+', '12345-678'),
+    ('search', r'x{1,3}y{1,3}$', 'xy' * 40 + 'xxyy'),
+    ('fullmatch', r'\w*\w*\w*!', 'peter_hunt_was_here!'),
+    ('search', r'ab?b?b?c', 'abbd' * 10 + 'abbc'),
+]
+ENGINES = ['backtrack', 'nfa']
+
+
+def best_of(func, number):
+    return min(repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    regex.pattern.CODEGEN_THRESHOLD = sys.maxsize
+    print(f'{"pattern":<16}{"engine":>10}{"parsed":>12}{"optimized":>12}'
+          f'{"speedup":>10}')
+    for method, raw, string in CASES:
+        nodes = _parse(raw, 0)
+        for engine in ENGINES:
+            times = []
+            for tokens in (nodes, _optimized(nodes)):
+                func = getattr(Pattern(raw, tokens, engine=engine), method)
+                times.append(best_of(lambda: func(string), 200))
+            print(f'{raw:<16}{engine:>10}'
+                  + ''.join(f'{time * 1e6:>10.2f}us' for time in times)
+                  + f'{times[0] / times[1]:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Possessive Repeats and Atomic Groups
+
+Matches patterns that fail after a long run of characters, once with greedy
+repeats and once with possessive repeats or atomic groups, which give
+nothing back, on the backtracker walking its tree and running generated
+source, next to re. Each pattern is built fresh, so its first
+CODEGEN_THRESHOLD calls walk the tree and every call after them runs the
+generated function. Atomic groups always walk the tree.
+
+Usage:
+    python -m benchmarks.bench_possessive
+"""
+
+import re
+from timeit import repeat
+
+from regex import compile, CODEGEN_THRESHOLD
+from regex.pattern import Atomic, Pattern
+
+
+CASES = [
+    (r'\w+\w!', r'\w++\w!', 'peter_hunt' * 20 + ' !'),
+    (r'\w*\d*x', r'(?>\w*\d*)x', '1234567890' * 20 + ' x'),
+    (r'\d{1,200}\d\.', r'\d{1,200}+\d\.', '7' * 200 + ' .'),
+]
+
+
+def best_of(func, number):
+    return min(repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    print(f'{"pattern":<16}{"tree":>12}{"generated":>12}{"re":>12}')
+    for greedy, possessive, string in CASES:
+        for raw in (greedy, possessive):
+            # a pattern of its own, the cached one may already be generated
+            compiled = Pattern(raw, compile(raw, engine='backtrack').nodes)
+            match = compiled.match
+            times = [min(repeat(lambda: match(string), number=1,
+                                repeat=CODEGEN_THRESHOLD - 1))]
+            match(string)
+            if compiled.source is None:
+                assert any(isinstance(node, Atomic)
+                           for node in compiled.nodes), raw
+                times.append(None)
+            else:
+                times.append(best_of(lambda: match(string), 20))
+            match = re.compile(raw).match
+            times.append(best_of(lambda: match(string), 20))
+            print(f'{raw:<16}'
+                  + ''.join(f'{"-":>12}' if time is None
+                            else f'{time * 1e6:>10.1f}us' for time in times))
+
+if __name__ == '__main__':
+    main()
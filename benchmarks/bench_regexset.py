@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+"""
+Benchmark for RegexSet
+
+Routes request paths through 3,000 patterns, half of them literal, once by
+matching every compiled pattern in turn and once with a RegexSet.
+
+Usage:
+    python -m benchmarks.bench_regexset
+"""
+
+from time import perf_counter
+
+from regex import compile, RegexSet
+
+
+PATTERNS = (
+    [rf'/api/v{number}/\w+/\d+' for number in range(1500)]
+    + [f'/static/{number}/' for number in range(1500)]
+)
+PATHS = ['/api/v1499/users/12', '/static/7/app.js', '/missing/page'] * 100
+
+
+def main():
+    compiled = [compile(pattern) for pattern in PATTERNS]
+    begin = perf_counter()
+    expected = [[index for index, pattern in enumerate(compiled)
+                 if pattern.match(path)] for path in PATHS]
+    loop_time = perf_counter() - begin
+
+    regex_set = RegexSet(PATTERNS)
+    begin = perf_counter()
+    found = [regex_set.matches(path) for path in PATHS]
+    set_time = perf_counter() - begin
+
+    assert found == expected
+    print(f'{"loop":<10}{loop_time / len(PATHS) * 1e6:>12.1f}us')
+    print(f'{"RegexSet":<10}{set_time / len(PATHS) * 1e6:>12.1f}us')
+    print(f'speedup {loop_time / set_time:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
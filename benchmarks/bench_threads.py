@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Threads
+
+Runs one compiled pattern per engine, shared by every thread of a
+ThreadPoolExecutor, over a list of log lines and reports matches per second
+and the speedup over one thread. With the GIL only one thread runs Python at
+a time, so the numbers show the cost of sharing; on a free-threaded build
+(python3.13t and later, run with PYTHON_GIL=0) they show the scaling.
+
+Usage:
+    python -m benchmarks.bench_threads
+"""
+
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from random import Random
+from sysconfig import get_config_var
+from time import perf_counter
+
+from regex import compile
+
+
+PATTERN = r'\d+\.\d+\.\d+\.\d+ \w+ /\w+ \d+'
+ENGINES = ['backtrack', 'nfa', 'dfa', 'vm']
+THREADS = [1, 2, 4, 8]
+LINES = 4000
+
+
+def make_lines():
+    rng = Random(0)
+    return [
+        f'{rng.randrange(256)}.{rng.randrange(256)}.0.1 '
+        f'{rng.choice(["GET", "POST"])} /{rng.choice(["home", "api"])} '
+        f'{rng.choice([200, 404, "-"])}'
+        for _ in range(LINES)
+    ]
+
+
+def throughput(pattern, lines, threads):
+    chunks = [lines[index::threads] for index in range(threads)]
+
+    def run(chunk):
+        match = pattern.match
+        for line in chunk:
+            match(line)
+
+    with ThreadPoolExecutor(threads) as executor:
+        start = perf_counter()
+        list(executor.map(run, chunks))
+        return len(lines) / (perf_counter() - start)
+
+
+def main():
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    free_threaded = bool(get_config_var('Py_GIL_DISABLED'))
+    print(f'free-threaded build: {free_threaded}, GIL enabled: {gil}')
+    lines = make_lines()
+    print(f'{"threads":<12}' + ''.join(f'{count:>16}' for count in THREADS))
+    for engine in ENGINES:
+        pattern = compile(PATTERN, engine=engine)
+        # warm the DFA cache and the generated source
+        for line in lines[:200]:
+            pattern.match(line)
+        rates = [max(throughput(pattern, lines, count) for _ in range(3))
+                 for count in THREADS]
+        print(f'{engine:<12}' + ''.join(
+            f'{rate / 1e3:>9.1f}k {rate / rates[0]:>4.1f}x' for rate in rates
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Benchmark for DEBUG Tracing Overhead
+
+Compares patterns compiled without DEBUG, which run the plain node methods,
+against the same patterns with every traceable method wrapped the way they all
+used to be, building the trace of each call and only skipping the printing
+while DEBUG is off. Generating source for hot backtrack patterns is turned
+off, so both walk their trees.
+
+Usage:
+    python -m benchmarks.bench_tracing
+"""
+
+import sys
+from timeit import repeat
+
+import regex.pattern
+from regex import compile
+from regex.pattern import INDENT, LAST_INDENT, _rebuilt
+
+
+CASES = [
+    (r'\w+ \d+?', 'peter_hunt 123'),
+    (r'12{2,3}', '1222'),
+    (r'a*b', 'aaaaaaab'),
+]
+
+_wrapped_classes = {}
+_last_indent = 0
+
+
+def always_wrapped(func):
+    # the wrapper of every traceable method before DEBUG patterns got copies
+    # of their own, without its print calls, which DEBUG being off skipped
+    def decorated(*args):
+        global _last_indent
+        if args[-1] != _last_indent:
+            _last_indent = args[-1]
+
+        def indent():
+            if not isinstance(args[-1], int):
+                indent = 0
+            else:
+                indent = args[-1]
+            if indent == 0:
+                return ''
+            else:
+                return INDENT * (indent - 1) + LAST_INDENT
+
+        arg_names = [*func.__code__.co_varnames]
+        arg_names = arg_names[:arg_names.index('debug_indent') + 1]
+        if arg_names[0] == 'self':
+            arg_names = arg_names[1:]
+            display_args = args[1:]
+        elif arg_names[0] == 'cls':
+            arg_names = arg_names[1:]
+            args = args[1:] if len(args) > len(arg_names) else args
+            display_args = args[:]
+        f',\n{indent()}          '.join(
+            f'{name}={display_args[index]!r}'
+            for index, name in enumerate(arg_names[:-1])
+        )
+        return func(*args)
+    return decorated
+
+
+def wrapped_class(cls):
+    if cls in _wrapped_classes:
+        return _wrapped_classes[cls]
+
+    wrapped = type(cls.__name__, (cls,), {
+        '__module__': cls.__module__,
+        '__qualname__': cls.__qualname__,
+    })
+    seen = set()
+    for klass in cls.__mro__:
+        for name, attr in vars(klass).items():
+            if name in seen:
+                continue
+            seen.add(name)
+            if isinstance(attr, classmethod):
+                if getattr(attr.__func__, '_debugable', False):
+                    setattr(wrapped, name,
+                            always_wrapped(getattr(wrapped, name)))
+            elif getattr(attr, '_debugable', False):
+                setattr(wrapped, name, always_wrapped(attr))
+
+    _wrapped_classes[cls] = wrapped
+    return wrapped
+
+
+def best_of(func, number):
+    return min(repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    regex.pattern.CODEGEN_THRESHOLD = sys.maxsize
+    print(f'{"pattern":<14}{"wrapped":>12}{"plain":>12}{"speedup":>10}')
+    for raw, string in CASES:
+        plain = compile(raw, engine='backtrack')
+        wrapped = _rebuilt(plain, wrapped_class)
+        assert wrapped.match(string).span() == plain.match(string).span()
+        wrapped_time = best_of(lambda: wrapped.match(string), 2000)
+        plain_time = best_of(lambda: plain.match(string), 2000)
+        print(f'{raw:<14}{wrapped_time * 1e6:>10.2f}us'
+              f'{plain_time * 1e6:>10.2f}us'
+              f'{wrapped_time / plain_time:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
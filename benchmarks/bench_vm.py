@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the Bytecode VM
+
+Compares the tree walking backtracker against the flat bytecode program run
+by engine='vm', with the NFA simulation for reference. Generating source for
+hot backtrack patterns is turned off, so the backtracker walks its tree.
+
+Usage:
+    python -m benchmarks.bench_vm
+"""
+
+import sys
+from timeit import repeat
+
+import regex.pattern
+from regex import compile
+
+
+CASES = [
+    ('match', r'\w+ \d+?', 'peter_hunt 123'),
+    ('match', r'12{2,3}', '1222'),
+    ('match', r'a*b', 'aaaaaaaaaaaaaaab'),
+    ('search', r'\d+ms', 'GET /index.html 200 took 125ms'),
+    ('search', r'\w+@\w+\.com', 'mail peter_hunt@example.com now'),
+]
+ENGINES = ['backtrack', 'vm', 'nfa']
+
+
+def best_of(func, number):
+    return min(repeat(func, number=number, repeat=5)) / number
+
+
+def main():
+    regex.pattern.CODEGEN_THRESHOLD = sys.maxsize
+    print(f'{"pattern":<16}' + ''.join(f'{engine:>12}' for engine in ENGINES)
+          + f'{"speedup":>10}')
+    for method, raw, string in CASES:
+        times = []
+        for engine in ENGINES:
+            func = getattr(compile(raw, engine=engine), method)
+            times.append(best_of(lambda: func(string), 500))
+        print(f'{raw:<16}'
+              + ''.join(f'{time * 1e6:>10.2f}us' for time in times)
+              + f'{times[0] / times[1]:>9.1f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -2,7 +2,9 @@ from .pattern import *
 from .pattern import __all__ as __pattern_all__
 from .regex import *
 from .regex import __all__ as __regex_all__
+from .regexset import *
+from .regexset import __all__ as __regexset_all__
 
 __version__ = '0.1.0'
 __version_info__ = tuple(int(segment) for segment in __version__.split('.'))
-__all__ = __pattern_all__ + __regex_all__
+__all__ = __pattern_all__ + __regex_all__ + __regexset_all__
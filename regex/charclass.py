@@ -0,0 +1,237 @@
+from bisect import bisect_right
+from sys import maxunicode
+from typing import Callable, Dict, Iterable, List, Tuple
+from unicodedata import category
+
+from .constants import DECIMAL_BYTES, WHITESPACE_BYTES, WORDCHAR_BYTES
+
+
+__all__ = [
+    'CharClass',
+    'charclass',
+    'category_ranges',
+    'complement',
+    'folded',
+    'DIGIT', 'SPACE', 'WORD',
+]
+
+
+Ranges = List[Tuple[int, int]]
+
+# answers a class remembers, so a text with many distinct characters can't
+# grow it without bound
+_MEMO_SIZE = 4096
+
+_interned: Dict[tuple, 'CharClass'] = {}
+# ranges of every general category, filled on the first \p lookup
+_categories: Dict[str, Ranges] = {}
+
+
+def _merged(ranges: Iterable[Tuple[int, int]], /) -> Ranges:
+    merged = []
+    for low, high in sorted(ranges):
+        if merged and low <= merged[-1][1] + 1:
+            if high > merged[-1][1]:
+                merged[-1] = (merged[-1][0], high)
+        else:
+            merged.append((low, high))
+    return merged
+
+
+def _bitmap(ranges: Ranges, stop: int, /) -> int:
+    bitmap = 0
+    for low, high in ranges:
+        if low >= stop:
+            break
+        high = min(high, stop - 1)
+        bitmap |= (1 << high + 1) - (1 << low)
+    return bitmap
+
+
+def _scan(predicate: Callable[[str], bool], start: int, /) -> Ranges:
+    ranges = []
+    low = None
+    for code in range(start, maxunicode + 1):
+        if predicate(chr(code)):
+            if low is None:
+                low = code
+        elif low is not None:
+            ranges.append((low, code - 1))
+            low = None
+    if low is not None:
+        ranges.append((low, maxunicode))
+    return ranges
+
+
+def complement(ranges: Ranges, /, stop: int = maxunicode) -> Ranges:
+    result = []
+    low = 0
+    for start, end in ranges:
+        if start > low:
+            result.append((low, start - 1))
+        low = end + 1
+    if low <= stop:
+        result.append((low, stop))
+    return result
+
+
+def folded(ranges: Ranges, /, is_bytes: bool = False) -> Ranges:
+    # adds the other case of every character, bytes only fold ASCII letters
+    extra = []
+    for low, high in ranges:
+        if is_bytes:
+            high = min(high, 127)
+        for code in range(low, high + 1):
+            char = chr(code)
+            for other in (char.lower(), char.upper()):
+                if len(other) == 1 and other != char:
+                    if not is_bytes or other.isascii():
+                        extra.append((ord(other), ord(other)))
+    return _merged(ranges + extra)
+
+
+def category_ranges(name: str, /) -> Ranges:
+    # a general category like Lu, or all categories of a letter like L
+    if not _categories:
+        start = 0
+        current = category('\x00')
+        for code in range(1, maxunicode + 2):
+            kind = category(chr(code)) if code <= maxunicode else None
+            if kind != current:
+                _categories.setdefault(current, []).append((start, code - 1))
+                start = code
+                current = kind
+    if len(name) == 1:
+        ranges = [item for kind, kind_ranges in _categories.items()
+                  if kind[0] == name for item in kind_ranges]
+        if ranges:
+            return _merged(ranges)
+    elif name in _categories:
+        return list(_categories[name])
+    raise KeyError(name)
+
+
+class CharClass(dict):
+    # ASCII characters are tested against a 128-bit bitmap and the rest
+    # against sorted ranges with bisect; byte values have their own bitmap,
+    # since a class like \w only takes ASCII bytes but more characters.
+    # the answers are kept in the dict, so `in` is a plain lookup for every
+    # character already seen
+    __slots__ = ('name', 'ascii', 'bytes', 'starts', 'ends', '_predicate')
+
+    __contains__ = dict.__getitem__
+    __eq__ = object.__eq__
+    __ne__ = object.__ne__
+    __hash__ = object.__hash__
+
+    def __init__(self, name: str, ranges: Ranges, bytes_bitmap: int,
+                 /) -> None:
+        self.name = name
+        self.ascii = _bitmap(ranges, 128)
+        self.bytes = bytes_bitmap
+        self.starts = tuple(low for low, high in ranges if high >= 128)
+        self.ends = tuple(high for low, high in ranges if high >= 128)
+        self._predicate = None
+
+    @classmethod
+    def lazy(cls, name: str, predicate: Callable[[str], bool],
+             byte_values: Iterable[int], /) -> 'CharClass':
+        # the ranges past ASCII take a scan of all of Unicode, which is only
+        # done once a character past ASCII is tested
+        instance = cls(name, [], sum(1 << value for value in byte_values))
+        instance.ascii = sum(1 << code for code in range(128)
+                             if predicate(chr(code)))
+        instance.starts = instance.ends = None
+        instance._predicate = predicate
+        return instance
+
+    def __repr__(self, /) -> str:
+        return f'<regex.CharClass object; {self.name}>'
+
+    def __bool__(self, /) -> bool:
+        return True
+
+    def __reduce__(self, /):
+        if self._predicate is not None:
+            return self.name
+        return charclass, (self.ranges(), self.bytes)
+
+    def _load(self, /) -> None:
+        ranges = _scan(self._predicate, 128)
+        self.ends = tuple(high for low, high in ranges)
+        self.starts = tuple(low for low, high in ranges)
+
+    def __missing__(self, char, /) -> bool:
+        if char.__class__ is int:
+            found = self.bytes >> char & 1 == 1
+        else:
+            code = ord(char)
+            if code < 128:
+                found = self.ascii >> code & 1 == 1
+            else:
+                if self.starts is None:
+                    self._load()
+                index = bisect_right(self.starts, code)
+                found = index > 0 and code <= self.ends[index - 1]
+        if len(self) < _MEMO_SIZE:
+            self[char] = found
+        return found
+
+    def ranges(self, /) -> Ranges:
+        if self.starts is None:
+            self._load()
+        ascii_ranges = [(code, code) for code in range(128)
+                        if self.ascii >> code & 1]
+        return _merged(ascii_ranges + list(zip(self.starts, self.ends)))
+
+    def byte_ranges(self, /) -> Ranges:
+        return _merged((value, value) for value in range(256)
+                       if self.bytes >> value & 1)
+
+    def mask(self, numpy, codes, /):
+        # a whole column of byte values or code points at once, with a
+        # lookup table for bytes and ASCII and a binary search for the rest
+        if codes.dtype == numpy.uint8:
+            return numpy.array([self.bytes >> value & 1
+                                for value in range(256)], bool)[codes]
+        table = numpy.array([self.ascii >> code & 1 for code in range(128)],
+                            bool)
+        found = table[numpy.minimum(codes, 127)] & (codes < 128)
+        high = codes >= 128
+        if high.any():
+            if self.starts is None:
+                self._load()
+            # a code before the first range looks up the -1 in front
+            ends = numpy.array((-1, *self.ends), numpy.int64)
+            index = numpy.searchsorted(numpy.array(self.starts, numpy.int64),
+                                       codes[high], 'right')
+            found[high] = codes[high] <= ends[index]
+        return found
+
+
+def charclass(ranges: Ranges, bytes_bitmap: int = None, /) -> CharClass:
+    # classes are built once and shared by every pattern using them, by
+    # default byte values are in the class when the same characters are
+    if bytes_bitmap is not None:
+        # the ranges of a pickled class are merged already
+        instance = _interned.get((tuple(ranges), bytes_bitmap))
+        if instance is not None:
+            return instance
+    ranges = _merged(ranges)
+    if bytes_bitmap is None:
+        bytes_bitmap = _bitmap(ranges, 256)
+    key = (tuple(ranges), bytes_bitmap)
+    instance = _interned.get(key)
+    if instance is None:
+        instance = _interned[key] = CharClass(
+            f'_class{len(_interned)}', ranges, bytes_bitmap,
+        )
+    return instance
+
+
+# like re, str patterns take Unicode digits, whitespace and word characters
+# and bytes patterns only the ASCII ones
+DIGIT = CharClass.lazy('DIGIT', str.isdecimal, DECIMAL_BYTES)
+SPACE = CharClass.lazy('SPACE', str.isspace, WHITESPACE_BYTES)
+WORD = CharClass.lazy('WORD', lambda char: char.isalnum() or char == '_',
+                      WORDCHAR_BYTES)
@@ -3,3 +3,10 @@ OCTAL = {*'01234567'}
 DECIMAL = {*'0123456789'}
 HEXADECIMAL = {*'0123456789ABCDEFabcdef'}
 WORDCHAR = {*'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_'}
+
+# the byte values of the sets above, used by bytes patterns
+WHITESPACE_BYTES = {*b' \t\n\r\f\v'}
+DECIMAL_BYTES = {*b'0123456789'}
+WORDCHAR_BYTES = {
+    *b'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_'
+}
@@ -0,0 +1,300 @@
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+from .limits import budget
+from .nfa import START, END, SPLIT, JMP, MATCH, NFA, consumes
+
+
+__all__ = [
+    'DFA_CACHE_SIZE',
+    'DFA',
+]
+
+
+# states plus transitions kept before the cache is flushed
+DFA_CACHE_SIZE = 10000
+# flushes tolerated in one call before it is handed back to the NFA
+_MAX_FLUSHES = 3
+# calls handed back to the NFA before the DFA gives up on the pattern
+_MAX_FALLBACKS = 3
+
+
+# modes a state is built for, searching states start a new thread after
+# every character until one of their threads matches and advancing start
+# states don't accept the empty match
+_MATCH = 0
+_FULLMATCH = 1
+_SEARCH = 2
+_ADVANCE = 3
+
+
+class _State:
+    __slots__ = ('threads', 'mode', 'match', 'fresh', 'next', 'eof')
+
+    def __init__(self, threads: Tuple[int, ...], mode: int, match: bool,
+                 fresh: bool, /) -> None:
+        self.threads = threads
+        self.mode = mode
+        self.match = match
+        # no thread started before this state survived into it
+        self.fresh = fresh
+        self.next: Dict[object, '_State'] = {}
+        self.eof: Optional[bool] = None
+
+
+class _Blowup(Exception):
+    pass
+
+
+class DFA:
+    def __init__(self, nfa: NFA, /, max_size: int = DFA_CACHE_SIZE) -> None:
+        self.nfa = nfa
+        self.max_size = max_size
+        self.failed = False
+        self.flushes = 0
+        self.fallbacks = 0
+        self._states: Dict[tuple, _State] = {}
+        self._starts: Dict[tuple, _State] = {}
+        self._size = 0
+        # held while states are built, following a transition already built
+        # takes no lock so threads sharing a pattern only wait on misses
+        self._lock = Lock()
+
+    def __repr__(self, /) -> str:
+        return (f'<regex.DFA object; {len(self._states)} states, '
+                f'size={self._size}/{self.max_size}>')
+
+    def info(self, /) -> dict:
+        return {
+            'states': len(self._states),
+            'size': self._size,
+            'max_size': self.max_size,
+            'flushes': self.flushes,
+            'fallbacks': self.fallbacks,
+            'failed': self.failed,
+        }
+
+    def clear(self, /) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self, /) -> None:
+        for state in self._states.values():
+            state.next.clear()
+        self._states.clear()
+        self._starts.clear()
+        self._size = 0
+
+    def _follow(self, pc: int, at_start: bool, at_end: bool,
+                threads: list, seen: set, /) -> None:
+        # unlike NFA._follow the end of the string isn't known while building
+        # a state, so END stays in the thread list and is resolved by _eof
+        code = self.nfa.code
+        stack = [pc]
+        while stack:
+            pc = stack.pop()
+            if pc in seen:
+                continue
+            seen.add(pc)
+            op, a, b = code[pc]
+            if op == JMP:
+                stack.append(a)
+            elif op == SPLIT:
+                stack.append(b)
+                stack.append(a)
+            elif op == START:
+                if at_start:
+                    stack.append(pc + 1)
+            elif op == END and at_end:
+                stack.append(pc + 1)
+            else:
+                threads.append(pc)
+
+    def _state(self, threads: list, mode: int, fresh: bool = False,
+               /) -> _State:
+        key = (tuple(threads), mode, fresh)
+        state = self._states.get(key)
+        if state is None:
+            if self._size >= self.max_size:
+                self._flush()
+            match = mode in {_MATCH, _SEARCH} and MATCH in (
+                self.nfa.code[pc][0] for pc in threads
+            )
+            state = self._states[key] = _State(key[0], mode, match, fresh)
+            self._size += 1
+        return state
+
+    def _flush(self, /) -> None:
+        self._clear()
+        self.flushes += 1
+
+    def _start(self, at_start: bool, mode: int, /) -> _State:
+        state = self._starts.get((at_start, mode))
+        if state is None:
+            with self._lock:
+                state = self._starts.get((at_start, mode))
+                if state is None:
+                    threads = []
+                    self._follow(0, at_start, False, threads, set())
+                    state = self._state(threads, mode, True)
+                    self._starts[at_start, mode] = state
+        return state
+
+    def _miss(self, state: _State, char, flushes: int, /) -> tuple:
+        # flushes counts those done by this call, which gives up on the DFA
+        # once it has flushed too often
+        with self._lock:
+            target = state.next.get(char)
+            if target is None:
+                before = self.flushes
+                target = self._transition(state, char)
+                flushes += self.flushes - before
+        if flushes > _MAX_FLUSHES:
+            raise _Blowup
+        return target, flushes
+
+    def _transition(self, state: _State, char, /) -> _State:
+        code = self.nfa.code
+        mode = state.mode
+        threads = []
+        seen = set()
+        for pc in state.threads:
+            op = code[pc][0]
+            if op == MATCH:
+                if mode in {_MATCH, _SEARCH}:
+                    # lower priority threads can't win anymore
+                    break
+            elif op != END and consumes(code[pc], char):
+                self._follow(pc + 1, False, False, threads, seen)
+
+        if mode == _SEARCH and state.match or mode == _ADVANCE:
+            # keep stepping the threads ahead of the match, start no more
+            target = self._state(threads, _MATCH)
+        elif mode == _SEARCH:
+            fresh = not threads
+            self._follow(0, False, False, threads, seen)
+            target = self._state(threads, _SEARCH, fresh)
+        else:
+            target = self._state(threads, mode)
+        state.next[char] = target
+        self._size += 1
+        return target
+
+    def _eof(self, state: _State, at_start: bool, /) -> bool:
+        if state.eof is not None and not at_start:
+            return state.eof
+        code = self.nfa.code
+        eof = False
+        for pc in state.threads:
+            if code[pc][0] == END:
+                threads = []
+                self._follow(pc + 1, at_start, True, threads, set())
+                if any(code[pc][0] == MATCH for pc in threads):
+                    eof = True
+                    break
+            elif code[pc][0] == MATCH:
+                eof = True
+                break
+        if not at_start:
+            state.eof = eof
+        return eof
+
+    def _scan(self, string, pos: int, endpos: int, mode: int, /):
+        state = self._start(pos == 0, mode)
+        limit = budget.get()
+        matched = None
+        flushes = 0
+
+        for index in range(pos, endpos):
+            if state.match:
+                matched = index
+            if not state.threads:
+                return matched
+            if limit is not None:
+                limit.step()
+            char = string[index]
+            target = state.next.get(char)
+            if target is None:
+                target, flushes = self._miss(state, char, flushes)
+            state = target
+
+        if self._eof(state, endpos == 0) and (
+            mode != _ADVANCE or endpos > pos
+        ):
+            matched = endpos
+        return matched
+
+    def _search(self, string, pos: int, endpos: int, prefix: str, /):
+        # finds where the leftmost match ends and the last index no earlier
+        # thread survived past, which is where the match can start from
+        state = self._start(pos == 0, _SEARCH)
+        idle = self._start(False, _SEARCH)
+        limit = budget.get()
+        base = index = pos
+        matched = None
+        flushes = 0
+
+        while index < endpos:
+            if state.match:
+                matched = index
+            elif state is idle and prefix:
+                index = base = string.find(prefix, index, endpos)
+                if index == -1:
+                    return
+            if not state.threads:
+                break
+            if limit is not None:
+                limit.step()
+            char = string[index]
+            target = state.next.get(char)
+            if target is None:
+                target, flushes = self._miss(state, char, flushes)
+            state = target
+            index += 1
+            if state.fresh:
+                base = index
+        else:
+            if self._eof(state, endpos == 0):
+                matched = endpos
+
+        if matched is not None:
+            return base
+
+    def _run(self, string, pos: int, endpos: int, mode: int, /):
+        if not self.failed:
+            try:
+                return self._scan(string, pos, endpos, mode)
+            except _Blowup:
+                self._fail()
+        if mode == _FULLMATCH:
+            return self.nfa.fullmatch(string, pos, endpos)
+        return self.nfa.match(string, pos, endpos, mode == _ADVANCE)
+
+    def _fail(self, /) -> None:
+        with self._lock:
+            self.fallbacks += 1
+            if self.fallbacks >= _MAX_FALLBACKS:
+                self.failed = True
+                self._clear()
+
+    def search(self, string, pos: int, endpos: int, prefix: str = '',
+               /) -> Optional[Tuple[int, int]]:
+        if not self.failed:
+            try:
+                base = self._search(string, pos, endpos, prefix)
+            except _Blowup:
+                self._fail()
+            else:
+                if base is None:
+                    return
+                # the match is known to exist, only its start is left to the
+                # NFA, which begins where every earlier thread had died
+                pos = base
+        return self.nfa.search(string, pos, endpos, prefix)
+
+    def match(self, string, pos: int, endpos: int, advance: bool = False,
+              /) -> Optional[int]:
+        return self._run(string, pos, endpos, _ADVANCE if advance else _MATCH)
+
+    def fullmatch(self, string, pos: int, endpos: int, /) -> Optional[int]:
+        return self._run(string, pos, endpos, _FULLMATCH)
@@ -0,0 +1,84 @@
+from hashlib import sha256
+from os import getpid, makedirs, replace
+from os.path import join
+from pickle import HIGHEST_PROTOCOL, dumps, loads
+from threading import get_ident
+from typing import List, Optional
+
+try:
+    from fcntl import LOCK_EX, LOCK_SH, LOCK_UN, flock
+except ImportError:
+    # without flock, entries are still renamed into place whole
+    flock = None
+
+
+__all__ = [
+    'DiskCache',
+]
+
+
+class DiskCache:
+    # the parsed nodes of each pattern in a pickle file named by a hash of
+    # its key; readers take a shared lock on the directory's lock file and
+    # writers an exclusive one, and files are written under another name and
+    # renamed, so no process ever reads half an entry
+    __slots__ = ('path', 'version')
+
+    def __init__(self, path: str, version: str, /) -> None:
+        makedirs(path, exist_ok=True)
+        self.path = path
+        # entries written by any other version are never read
+        self.version = version
+
+    def __repr__(self, /) -> str:
+        return f'<regex.DiskCache object; {self.path!r}>'
+
+    def _key(self, raw, flags: int, /) -> tuple:
+        return type(raw).__name__, raw, flags, self.version
+
+    def _file(self, key: tuple, /) -> str:
+        return join(self.path, sha256(repr(key).encode()).hexdigest())
+
+    def _lock(self, exclusive: bool, /):
+        file = open(join(self.path, 'lock'), 'ab')
+        if flock is not None:
+            flock(file, LOCK_EX if exclusive else LOCK_SH)
+        return file
+
+    def _unlock(self, file, /) -> None:
+        if flock is not None:
+            flock(file, LOCK_UN)
+        file.close()
+
+    def load(self, raw, flags: int, /) -> Optional[List]:
+        key = self._key(raw, flags)
+        try:
+            lock = self._lock(False)
+            try:
+                with open(self._file(key), 'rb') as file:
+                    data = file.read()
+            finally:
+                self._unlock(lock)
+            stored, nodes = loads(data)
+        except Exception:
+            # missing, unreadable or from an older layout, parsed again
+            return None
+        # the key is stored too, in case two keys ever hash the same
+        return nodes if stored == key else None
+
+    def store(self, raw, flags: int, nodes: List, /) -> None:
+        key = self._key(raw, flags)
+        data = dumps((key, nodes), HIGHEST_PROTOCOL)
+        target = self._file(key)
+        temp = f'{target}.{getpid()}.{get_ident()}'
+        try:
+            lock = self._lock(True)
+            try:
+                with open(temp, 'wb') as file:
+                    file.write(data)
+                replace(temp, target)
+            finally:
+                self._unlock(lock)
+        except OSError:
+            # a full or read-only disk only costs the next process a parse
+            pass
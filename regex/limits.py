@@ -0,0 +1,47 @@
+from contextvars import ContextVar
+from time import perf_counter
+
+
+__all__ = [
+    'Budget',
+    'budget',
+]
+
+
+# steps between looks at the clock
+_CLOCK_STEPS = 64
+
+
+class Budget:
+    # the steps one call has taken and how far it may go; every engine
+    # counts in its own unit of work, the backtracker an attempt at a node
+    # and offset, the NFA a thread moved over a character, the DFA a
+    # transition and the VM an instruction
+    __slots__ = ('steps', 'max_steps', 'timeout', 'deadline', 'exceeded',
+                 '_clock')
+
+    def __init__(self, max_steps: int, timeout: float, exceeded: type,
+                 /) -> None:
+        self.steps = 0
+        self.max_steps = max_steps
+        self.timeout = timeout
+        self.deadline = None if timeout is None else perf_counter() + timeout
+        # raised with a message and the steps taken
+        self.exceeded = exceeded
+        self._clock = _CLOCK_STEPS
+
+    def step(self, count: int = 1, /) -> None:
+        self.steps += count
+        if self.max_steps is not None and self.steps > self.max_steps:
+            raise self.exceeded(f'more than {self.max_steps} steps',
+                                self.steps)
+        if self.deadline is not None and self.steps >= self._clock:
+            self._clock = self.steps + _CLOCK_STEPS
+            if perf_counter() > self.deadline:
+                raise self.exceeded(f'more than {self.timeout} seconds',
+                                    self.steps)
+
+
+# the budget of the call running in this context, None when nothing limits
+# or counts it
+budget = ContextVar('budget', default=None)
@@ -0,0 +1,261 @@
+from typing import List, Optional, Tuple
+
+from .limits import budget
+
+
+__all__ = [
+    'CHAR', 'CHAR_I', 'IN', 'NOT_IN', 'ANY', 'ANY_ALL',
+    'START', 'END', 'SPLIT', 'JMP', 'MATCH',
+    'NEWLINE',
+    'NFA',
+    'consumes',
+]
+
+
+# instructions are (opcode, a, b) tuples, opcodes up to ANY_ALL consume one
+# character and the rest are followed without consuming any
+CHAR = 0  # character equals a
+CHAR_I = 1  # lowercased character equals a
+IN = 2  # character in a
+NOT_IN = 3  # character not in a
+ANY = 4  # character not in NEWLINE
+ANY_ALL = 5  # any character
+START = 6  # at the start of the string
+END = 7  # at the end of the string
+SPLIT = 8  # try a, then b
+JMP = 9  # go to a
+MATCH = 10
+
+
+Instruction = Tuple[int, object, object]
+
+# bytes patterns see the byte values of bytes-like subjects as characters
+NEWLINE = frozenset({'\n', ord('\n')})
+
+
+def consumes(instruction: Instruction, char, /) -> bool:
+    op, a, _ = instruction
+    return (
+        op == CHAR and char == a or
+        op == CHAR_I and char.lower() == a or
+        op == IN and char in a or
+        op == NOT_IN and char not in a or
+        op == ANY and char not in NEWLINE or
+        op == ANY_ALL
+    )
+
+
+class NFA:
+    def __init__(self, nodes: list, /) -> None:
+        code = []
+        for node in nodes:
+            node._emit(code)
+        code.append((MATCH, None, None))
+        self.code: List[Instruction] = code
+
+    def __repr__(self, /) -> str:
+        return f'<regex.NFA object; {len(self.code)} instructions>'
+
+    def _follow(self, pc: int, index: int, endpos: int,
+                threads: List[int], seen: set, /) -> None:
+        code = self.code
+        stack = [pc]
+        while stack:
+            pc = stack.pop()
+            if pc in seen:
+                continue
+            seen.add(pc)
+            op, a, b = code[pc]
+            if op == JMP:
+                stack.append(a)
+            elif op == SPLIT:
+                stack.append(b)
+                stack.append(a)
+            elif op == START:
+                if index == 0:
+                    stack.append(pc + 1)
+            elif op == END:
+                if index == endpos:
+                    stack.append(pc + 1)
+            else:
+                threads.append(pc)
+
+    def _run(self, string, pos: int, endpos: int, full: bool,
+             advance: bool, /):
+        code = self.code
+        follow = self._follow
+        limit = budget.get()
+        threads = []
+        follow(0, pos, endpos, threads, set())
+        matched = None
+
+        for index in range(pos, endpos + 1):
+            if not threads:
+                break
+            if limit is not None:
+                limit.step(len(threads))
+            char = string[index] if index < endpos else None
+            next_threads = []
+            seen = set()
+            for pc in threads:
+                op, a, _ = code[pc]
+                if op == MATCH:
+                    if (
+                        (not full or index == endpos) and
+                        (not advance or index > pos)
+                    ):
+                        # lower priority threads can't win anymore
+                        matched = index
+                        break
+                elif char is None:
+                    continue
+                elif (
+                    op == CHAR and char == a or
+                    op == CHAR_I and char.lower() == a or
+                    op == IN and char in a or
+                    op == NOT_IN and char not in a or
+                    op == ANY and char not in NEWLINE or
+                    op == ANY_ALL
+                ):
+                    follow(pc + 1, index + 1, endpos, next_threads, seen)
+            threads = next_threads
+
+        return matched
+
+    def search(self, string, pos: int, endpos: int, prefix: str = '',
+               /) -> Optional[Tuple[int, int]]:
+        # threads started at earlier indices have the higher priority, a new
+        # one is started at every index until the first match is found
+        code = self.code
+        follow = self._follow
+        limit = budget.get()
+        threads = []
+        starts = []
+        seen = set()
+        matched = None
+        index = pos
+
+        while True:
+            if matched is None:
+                if not threads and prefix:
+                    index = string.find(prefix, index, endpos)
+                    if index == -1:
+                        break
+                count = len(threads)
+                follow(0, index, endpos, threads, seen)
+                starts.extend([index] * (len(threads) - count))
+            if not threads and (matched is not None or index >= endpos):
+                break
+            if limit is not None:
+                limit.step(len(threads))
+
+            char = string[index] if index < endpos else None
+            next_threads = []
+            next_starts = []
+            seen = set()
+            for pc, start in zip(threads, starts):
+                op, a, _ = code[pc]
+                if op == MATCH:
+                    matched = (start, index)
+                    break
+                elif char is None:
+                    continue
+                elif (
+                    op == CHAR and char == a or
+                    op == CHAR_I and char.lower() == a or
+                    op == IN and char in a or
+                    op == NOT_IN and char not in a or
+                    op == ANY and char not in NEWLINE or
+                    op == ANY_ALL
+                ):
+                    count = len(next_threads)
+                    follow(pc + 1, index + 1, endpos, next_threads, seen)
+                    next_starts.extend([start] * (len(next_threads) - count))
+            threads = next_threads
+            starts = next_starts
+            if index >= endpos:
+                break
+            index += 1
+
+        return matched
+
+    def stream(self, chunks, /):
+        # repeated searches over the concatenation of chunks, like finditer,
+        # with threads carried over chunk boundaries; yields absolute spans
+        # and the matched text, only keeping text some thread still needs
+        code = self.code
+        follow = self._follow
+        chunks = iter(chunks)
+        buffer = ''
+        base = 0  # offset of buffer[0]
+        eof = False
+        pos = 0
+        forbid = -1  # where an empty match was just found
+
+        while True:
+            threads = []
+            starts = []
+            seen = set()
+            matched = None
+            index = pos
+
+            while True:
+                # the next index must be read to know if it is the end
+                while index + 1 >= base + len(buffer) and not eof:
+                    chunk = next(chunks, None)
+                    if chunk is None:
+                        eof = True
+                        break
+                    if matched is not None:
+                        keep = matched[0]
+                    else:
+                        keep = starts[0] if starts else index
+                    # the first chunk decides between str and bytes
+                    kept = buffer[keep - base:]
+                    buffer = kept + chunk if kept else chunk
+                    base = keep
+                end = base + len(buffer)
+                endpos = end if eof else -1
+
+                if matched is None:
+                    count = len(threads)
+                    follow(0, index, endpos, threads, seen)
+                    starts.extend([index] * (len(threads) - count))
+                if not threads and (matched is not None or index >= end):
+                    break
+
+                char = buffer[index - base] if index < end else None
+                next_threads = []
+                next_starts = []
+                seen = set()
+                for pc, start in zip(threads, starts):
+                    if code[pc][0] == MATCH:
+                        if start == index == forbid:
+                            continue
+                        matched = (start, index)
+                        break
+                    elif char is not None and consumes(code[pc], char):
+                        count = len(next_threads)
+                        follow(pc + 1, index + 1, endpos, next_threads, seen)
+                        next_starts.extend(
+                            [start] * (len(next_threads) - count)
+                        )
+                threads = next_threads
+                starts = next_starts
+                if index >= end:
+                    break
+                index += 1
+
+            if matched is None:
+                return
+            start, pos = matched
+            yield matched, buffer[start - base:pos - base]
+            forbid = pos if start == pos else -1
+
+    def match(self, string, pos: int, endpos: int, advance: bool = False,
+              /) -> Optional[int]:
+        # with advance set, empty matches are skipped for the next best one
+        return self._run(string, pos, endpos, False, advance)
+
+    def fullmatch(self, string, pos: int, endpos: int, /) -> Optional[int]:
+        return self._run(string, pos, endpos, True, False)
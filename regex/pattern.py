@@ -1,8 +1,25 @@
-from dataclasses import dataclass
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields, replace
+from functools import partial
+from itertools import groupby, repeat
+from multiprocessing.shared_memory import SharedMemory
+from os import cpu_count
+from sys import getsizeof
+from threading import Lock
 from types import FunctionType
 from typing import List, Tuple
 
-from .constants import WHITESPACE, OCTAL, DECIMAL, HEXADECIMAL, WORDCHAR
+from .charclass import (CharClass, DIGIT, SPACE, WORD, category_ranges,
+                        charclass, complement, folded)
+from .constants import OCTAL, DECIMAL, HEXADECIMAL
+from .dfa import DFA_CACHE_SIZE, DFA
+from .diskcache import DiskCache
+from .limits import Budget, budget as _budget
+from .nfa import (CHAR, CHAR_I, IN, NOT_IN, ANY, ANY_ALL, START, END,
+                  SPLIT, JMP, NEWLINE, NFA)
+from .vm import Program
 
 
 __all__ = [
@@ -15,7 +32,13 @@ __all__ = [
     'VERBOSE', 'X',
     # 'TEMPLATE', 'T',
     'DEBUG',
+    'MEMO',
     'FLAGS',
+    'ENGINES',
+    'MAXREPEAT',
+    'MEMO_SIZE',
+    'CODEGEN_THRESHOLD',
+    'STREAM_CHUNK_SIZE',
     'INDENT', 'LAST_INDENT',
 
     '_special_chars_map',
@@ -24,15 +47,17 @@ __all__ = [
     '_count_map',
 
     'error',
+    'LimitExceeded',
     'Pattern',
     'Match',
 
     'Node',
     'Start', 'End', 'PlainText', 'Any',
     'Decimal', 'NonDecimal', 'Whitespace', 'NonWhitespace',
-    'WordChar', 'NonWordChar',
+    'WordChar', 'NonWordChar', 'CharSet',
 
-    'compile', 'purge',
+    'compile', 'purge', 'cache_info', 'set_cache_size',
+    'enable_disk_cache', 'disable_disk_cache', 'set_limits',
 ]
 
 
@@ -46,6 +71,23 @@ VERBOSE = X = 64  # ignore whitespace and comments
 
 # TEMPLATE = T = 1 # disable backtracking
 DEBUG = 128  # dump pattern after compilation
+MEMO = 512  # memoize the backtracker
+
+ENGINES = ('auto', 'backtrack', 'nfa', 'dfa', 'vm')
+
+# largest count accepted in {n,m}, counted repeats are unrolled by the NFA
+MAXREPEAT = 1000
+
+# results a MEMO pattern remembers during one match attempt
+MEMO_SIZE = 1 << 20
+
+# calls before a backtrack pattern is generated into a function
+CODEGEN_THRESHOLD = 100
+# every repeat nests a loop, and Python allows 20 nested blocks
+_MAX_GENERATED_REPEATS = 18
+
+# characters read at a time by Pattern.finditer_stream
+STREAM_CHUNK_SIZE = 1 << 16
 
 INDENT = '  '
 LAST_INDENT = '| '
@@ -60,6 +102,7 @@ FLAGS = {
     'VERBOSE': 64,
     'DEBUG': 128,
     # 'ASCII': 256,
+    'MEMO': 512,
 }
 
 
@@ -67,21 +110,56 @@ _special_chars_map = {i: '\\' + chr(i)
                       for i in b'()[]{}?*+-|^$\\.&~# \t\n\r\v\f'}
 
 
-_last_indent = 0
-_do_debug = False
+# str subjects are tested by character and bytes-like ones by byte value, a
+# pattern only ever sees one kind so both can share a class
+_DECIMAL = DIGIT
+_WHITESPACE = SPACE
+_WORDCHAR = WORD
+
+_traced_classes = {}
+_memoized_classes = {}
+# the trace and the memo of the call running in this context, which threads
+# never share
+_trace_state = ContextVar('_trace_state', default=None)
+_memo = ContextVar('_memo', default=None)
+
+# limits of every call that doesn't pass its own, set by set_limits
+_limits = {'max_steps': None, 'timeout': None}
 
 
 def _debugable(func: FunctionType, /) -> FunctionType:
+    # Only marks the method; patterns compiled with DEBUG get traced copies of
+    # their classes, so the plain classes run without any wrapper overhead.
+    func._debugable = True
+    return func
+
+
+class _Trace:
+    __slots__ = ('last_indent',)
+
+    def __init__(self, /) -> None:
+        self.last_indent = 0
+
+
+def _trace(func: FunctionType, /) -> FunctionType:
     def decorated(*args):
-        global _last_indent
-        if args[-1] != _last_indent:
-            if _do_debug and args[-1] > _last_indent:
-                if _last_indent == 0:
+        trace = _trace_state.get()
+        if trace is None:
+            # the outermost call is a pattern's, the trace lasts that call
+            token = _trace_state.set(_Trace())
+            try:
+                return decorated(*args)
+            finally:
+                _trace_state.reset(token)
+
+        if args[-1] != trace.last_indent:
+            if args[-1] > trace.last_indent:
+                if trace.last_indent == 0:
                     print('EXECUTION:')
                 else:
-                    print(f'{INDENT * (_last_indent - 1) + LAST_INDENT}'
+                    print(f'{INDENT * (trace.last_indent - 1) + LAST_INDENT}'
                           f'EXECUTION:')
-            _last_indent = args[-1]
+            trace.last_indent = args[-1]
 
         def indent():
             if not isinstance(args[-1], int):
@@ -106,35 +184,452 @@ def _debugable(func: FunctionType, /) -> FunctionType:
             f'{name}={display_args[index]!r}'
             for index, name in enumerate(arg_names[:-1])
         )
-        if _do_debug:
-            print(
-                f'{indent()}RUNNING: {func.__qualname__}\n'
-                f'{indent()}WITH ARG: {args_str}'
-            )
+        print(
+            f'{indent()}RUNNING: {func.__qualname__}\n'
+            f'{indent()}WITH ARG: {args_str}'
+        )
+        result = func(*args)
+        print(f'{indent()}RETURNED: {result}\n{indent()}')
+        return result
+    decorated._debugable = True
+    return decorated
+
+
+def _traced_class(cls: type, /) -> type:
+    if cls in _traced_classes:
+        return _traced_classes[cls]
+
+    traced = type(cls.__name__, (cls,), {
+        '__module__': cls.__module__,
+        '__qualname__': cls.__qualname__,
+    })
+    seen = set()
+    for klass in cls.__mro__:
+        for name, attr in vars(klass).items():
+            if name in seen:
+                continue
+            seen.add(name)
+            if isinstance(attr, classmethod):
+                if getattr(attr.__func__, '_debugable', False):
+                    # bound to the traced class so recursion stays traced
+                    setattr(traced, name, _trace(getattr(traced, name)))
+            elif getattr(attr, '_debugable', False):
+                setattr(traced, name, _trace(attr))
+
+    _traced_classes[cls] = traced
+    return traced
+
+
+def _rebuilt(obj, make_class, /):
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_rebuilt(item, make_class) for item in obj)
+    elif not isinstance(obj, (Node, Pattern)):
+        return obj
+    return make_class(type(obj))(**{
+        field.name: _rebuilt(getattr(obj, field.name), make_class)
+        for field in fields(obj) if field.init
+    })
+
+
+def _traced(obj, /):
+    return _rebuilt(obj, _traced_class)
+
+
+class _Memo:
+    __slots__ = ('results', 'hits', 'misses')
+
+    def __init__(self, /) -> None:
+        self.results = {}
+        self.hits = 0
+        self.misses = 0
+
+
+def _memoize(func: FunctionType, /) -> FunctionType:
+    def decorated(*args):
+        memo = _memo.get()
+        if memo is None:
+            # the outermost call is a pattern's, its memo lasts one attempt
+            memo = _Memo()
+            token = _memo.set(memo)
+            try:
+                return decorated(*args)
+            finally:
+                _memo.reset(token)
+                with args[0]._lock:
+                    args[0]._memo_hits += memo.hits
+                    args[0]._memo_misses += memo.misses
+
+        # the string and the indent don't change the result
+        key = (func, *(arg if type(arg) is int else id(arg)
+                       for arg in args[:-1]))
+        results = memo.results
+        if key in results:
+            memo.hits += 1
+            return results[key]
+        memo.misses += 1
         result = func(*args)
-        if _do_debug:
-            print(f'{indent()}RETURNED: {result}\n{indent()}')
+        if len(results) < MEMO_SIZE:
+            results[key] = result
         return result
+    decorated._debugable = True
     return decorated
 
 
+def _memoized_class(cls: type, /) -> type:
+    # only the pattern and the repeats recurse, leaf nodes are left alone
+    if not issubclass(cls, (Pattern, Greedy, NonGreedy)):
+        return cls
+    if cls in _memoized_classes:
+        return _memoized_classes[cls]
+
+    memoized = type(cls.__name__, (cls,), {
+        '__module__': cls.__module__,
+        '__qualname__': cls.__qualname__,
+    })
+    seen = set()
+    for klass in cls.__mro__:
+        for name, attr in vars(klass).items():
+            if name in seen:
+                continue
+            seen.add(name)
+            if isinstance(attr, classmethod):
+                if getattr(attr.__func__, '_debugable', False):
+                    setattr(memoized, name,
+                            classmethod(_memoize(attr.__func__)))
+            elif getattr(attr, '_debugable', False):
+                setattr(memoized, name, _memoize(attr))
+
+    _memoized_classes[cls] = memoized
+    return memoized
+
+
+def _memoized(obj, /):
+    return _rebuilt(obj, _memoized_class)
+
+
 class error(Exception):
     pass
 
 
+class LimitExceeded(error):
+    def __init__(self, message: str, steps: int, /) -> None:
+        super().__init__(message)
+        self.steps = steps
+
+    def __reduce__(self, /) -> tuple:
+        # raised in workers and pickled back to the caller
+        return type(self), (self.args[0], self.steps)
+
+
+def _literals(nodes: list, flags: int, /) -> Tuple[str, str]:
+    # the literal every match starts with and the longest one it contains
+    if flags & IGNORECASE:
+        return '', ''
+
+    prefix = ''
+    for node in nodes:
+        if not isinstance(node, Start):
+            if isinstance(node, PlainText):
+                prefix = node.value
+            break
+    required = max((node.value for node in nodes
+                    if isinstance(node, PlainText)), key=len, default='')
+    return prefix, required
+
+
+def _clamp(string, pos: int, endpos: int, /) -> Tuple[int, int]:
+    length = len(string)
+    if endpos is None or endpos > length:
+        endpos = length
+    elif endpos < 0:
+        endpos = 0
+    return min(max(pos, 0), length), endpos
+
+
+def _slice(string, start: int, end: int, /):
+    # like re, groups of buffers such as memoryviews and bytearrays are bytes
+    text = string[start:end]
+    return text if isinstance(text, (str, bytes)) else bytes(text)
+
+
 class Match:
-    def __init__(self, span: Tuple[int, int], match: str, /) -> None:
-        assert span[1] - span[0] == len(match), (span[1] - span[0], match)
-        self.span = span
-        self.match = match
+    # the string searched and the start and end of every group in one
+    # tuple, so the text of a group is only sliced out when asked for
+    __slots__ = ('re', 'string', 'pos', 'endpos', '_spans', 'steps')
+
+    def __init__(self, pattern, string, pos: int, endpos: int,
+                 spans: Tuple[int, ...], steps: int = None, /) -> None:
+        self.re = pattern
+        self.string = string
+        self.pos = pos
+        self.endpos = endpos
+        self._spans = spans
+        # the backtracking steps taken to find it, when they were counted
+        self.steps = steps
 
     def __repr__(self, /) -> str:
-        return f'<regex.Match object; span={self.span}, match={self.match!r}>'
+        return (f'<regex.Match object; span={self.span()}, '
+                f'match={self.group()!r}>')
 
+    def span(self, group: int = 0, /) -> Tuple[int, int]:
+        try:
+            if group >= 0:
+                return self._spans[group * 2], self._spans[group * 2 + 1]
+        except (IndexError, TypeError):
+            pass
+        raise IndexError('no such group')
 
-@dataclass
+    def start(self, group: int = 0, /) -> int:
+        return self.span(group)[0]
+
+    def end(self, group: int = 0, /) -> int:
+        return self.span(group)[1]
+
+    def _group(self, group: int, /):
+        start, end = self.span(group)
+        # a group that took no part in the match
+        return None if start == -1 else _slice(self.string, start, end)
+
+    def group(self, *groups):
+        if not groups:
+            return self._group(0)
+        elif len(groups) == 1:
+            return self._group(groups[0])
+        return tuple(self._group(group) for group in groups)
+
+    def __getitem__(self, group: int, /):
+        return self._group(group)
+
+    def groups(self, default=None) -> tuple:
+        return tuple(default if group is None else group
+                     for group in map(self._group,
+                                      range(1, len(self._spans) // 2)))
+
+    @property
+    def lastindex(self, /) -> int:
+        # no pattern captures groups yet
+        return None
+
+    @property
+    def lastgroup(self, /) -> str:
+        return None
+
+
+class _StreamMatch(Match):
+    # a stream isn't kept, so string holds the text of the match and the
+    # spans are offsets into the whole stream
+    __slots__ = ()
+
+    def _group(self, group: int, /):
+        start, end = self.span(group)
+        offset = self._spans[0]
+        return None if start == -1 else _slice(self.string, start - offset,
+                                               end - offset)
+
+
+def _node(cls: type, /) -> type:
+    # a frozen dataclass with __slots__, which dataclass only makes itself
+    # from Python 3.10 on; slots of the bases aren't declared again
+    cls = dataclass(frozen=True)(cls)
+    inherited = {name for klass in cls.__mro__[1:]
+                 for name in vars(klass).get('__slots__', ())}
+    names = tuple(field.name for field in fields(cls)
+                  if field.name not in inherited)
+    namespace = {name: value for name, value in vars(cls).items()
+                 if name not in {*names, '__dict__', '__weakref__'}}
+    namespace['__slots__'] = names
+    return type(cls)(cls.__name__, cls.__bases__, namespace)
+
+
+# nodes that only have flags, one of each is shared by every pattern
+_leaves = {}
+
+
+def _leaf(cls: type, flags: int, /) -> 'Node':
+    node = _leaves.get((cls, flags))
+    if node is None:
+        node = _leaves[cls, flags] = cls(flags)
+    return node
+
+
+@_node
 class Node:
-    pass
+    def __reduce__(self, /):
+        # pickle would restore the slots of a frozen node by setting them,
+        # and leaves are interned again
+        values = tuple(getattr(self, field.name) for field in fields(self)
+                       if field.init)
+        if type(self) in _LEAF_CLASSES:
+            return _leaf, (type(self), *values)
+        return type(self), values
+
+    def _reach(self, string: str, start: int, end: int,
+               debug_indent: int = 0, /) -> int:
+        # the furthest stop worth trying, most nodes take one character
+        return min(start + 1, end)
+
+    def _width(self, /) -> int:
+        # the most characters a match takes, None when unbounded
+        return 1
+
+    def _min_width(self, /) -> int:
+        return 1
+
+    def _columns(self, /) -> List['Node']:
+        # a node testing each character of a match, None when the width of
+        # a match can vary
+        return [self]
+
+
+def _repeat_reach(node: Node, string: str, start: int, end: int, times: int,
+                  debug_indent: int, /) -> int:
+    # repeated nodes take one character each, so walking forward finds how
+    # far the repeat can go without trying every stop up to the end
+    index = start
+    stop = min(start + times, end)
+    while index < stop and node.fullmatch(string, index, index + 1,
+                                          debug_indent):
+        index += 1
+    return index
+
+
+def _offset(index: str, offset: int, /) -> str:
+    if offset < 0:
+        return f'{index} - {-offset}'
+    return f'{index} + {offset}' if offset else index
+
+
+def _generate(nodes: List[Node], /) -> str:
+    # the backtracker unrolled into one function, every repeat becomes a loop
+    # over the stops it can take in the order the backtracker tries them, so
+    # a failed test moves on to the next stop of the innermost repeat
+    lines = ['def match(string, pos, endpos, least):', '    i0 = pos']
+    depth = 0
+    fail = 'return'
+
+    for node in nodes:
+        pad = '    ' * (depth + 1)
+        index = f'i{depth}'
+        if isinstance(node, Start):
+            lines.append(f'{pad}if {index} != 0:')
+        elif isinstance(node, End):
+            lines.append(f'{pad}if {index} != endpos:')
+        elif isinstance(node, PlainText):
+            if not node.value:
+                continue
+            size = len(node.value)
+            lines.append(f'{pad}if {index} + {size} > endpos or not '
+                         f'({node._source(index)}):')
+            lines.append(f'{pad}    {fail}')
+            lines.append(f'{pad}{index} += {size}')
+            continue
+        elif isinstance(node, Atomic):
+            return
+        elif isinstance(node, Possessive):
+            # takes every character it can and never gives one back
+            lower, upper = node._counts()
+            stop = 'endpos' if upper is None else (
+                f'min({index} + {upper}, endpos)'
+            )
+            lines.append(f'{pad}stop = {stop}')
+            lines.append(f'{pad}run = {index}')
+            lines.append(f'{pad}while run < stop and '
+                         f'{node.node._source("run")}:')
+            lines.append(f'{pad}    run += 1')
+            if lower:
+                lines.append(f'{pad}if run - {index} < {lower}:')
+                lines.append(f'{pad}    {fail}')
+            lines.append(f'{pad}{index} = run')
+            continue
+        elif isinstance(node, (Greedy, NonGreedy)):
+            if depth == _MAX_GENERATED_REPEATS:
+                return
+            lower, upper = node._counts()
+            run = f'j{depth}'
+            stop = 'endpos' if upper is None else (
+                f'min({index} + {upper}, endpos)'
+            )
+            lines.append(f'{pad}{run} = {index}')
+            lines.append(f'{pad}stop = {stop}')
+            lines.append(f'{pad}while {run} < stop and '
+                         f'{node.node._source(run)}:')
+            lines.append(f'{pad}    {run} += 1')
+            if lower:
+                lines.append(f'{pad}if {run} - {index} < {lower}:')
+                lines.append(f'{pad}    {fail}')
+            if isinstance(node, Greedy):
+                stops = f'range({run}, {_offset(index, lower - 1)}, -1)'
+            else:
+                stops = f'range({_offset(index, lower)}, {run} + 1)'
+            depth += 1
+            fail = 'continue'
+            lines.append(f'{pad}for i{depth} in {stops}:')
+            continue
+        else:
+            lines.append(f'{pad}if {index} >= endpos or not '
+                         f'{node._source(index)}:')
+            lines.append(f'{pad}    {fail}')
+            lines.append(f'{pad}{index} += 1')
+            continue
+        lines.append(f'{pad}    {fail}')
+
+    pad = '    ' * (depth + 1)
+    lines.append(f'{pad}if i{depth} >= least:')
+    lines.append(f'{pad}    return i{depth}')
+    return '\n'.join(lines) + '\n'
+
+
+def _sizeof(obj, seen: set, /) -> int:
+    # obj and everything it holds that hasn't been counted yet
+    if obj is None or id(obj) in seen or isinstance(obj, (type, CharClass)):
+        return 0
+    seen.add(id(obj))
+    size = getsizeof(obj)
+    if isinstance(obj, FunctionType):
+        # not its globals, which hold the builtins
+        return size + getsizeof(obj.__code__)
+    elif isinstance(obj, dict):
+        return size + sum(_sizeof(key, seen) + _sizeof(value, seen)
+                          for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        return size + sum(_sizeof(item, seen) for item in obj)
+    for klass in type(obj).__mro__:
+        for name in vars(klass).get('__slots__', ()):
+            size += _sizeof(getattr(obj, name, None), seen)
+    if hasattr(obj, '__dict__'):
+        size += _sizeof(vars(obj), seen)
+    return size
+
+
+def _call(pattern, method: str, string, /):
+    # only the span goes back, the match is built on the caller's string
+    match = getattr(pattern, method)(string)
+    return None if match is None else match.span()
+
+
+def _segment(pattern, name: str, pos: int, start: int, stop: int,
+             limit: int, /) -> list:
+    # the spans of the matches starting between start and stop, found in
+    # text[start:limit] of the string in shared memory, which holds it from
+    # pos on
+    memory = SharedMemory(name)
+    try:
+        if isinstance(pattern.raw, bytes):
+            text = bytes(memory.buf[start - pos:limit - pos])
+        else:
+            text = bytes(memory.buf[(start - pos) * 4:
+                                    (limit - pos) * 4]).decode(
+                'utf-32-le', 'surrogatepass',
+            )
+    finally:
+        memory.close()
+
+    spans = []
+    for begin, end in pattern._spans(text, 0, limit - start):
+        if begin >= stop - start:
+            break
+        spans.append((begin + start, end + start))
+    return spans
 
 
 @dataclass
@@ -142,6 +637,115 @@ class Pattern:
     raw: str
     nodes: List[Node]
     flags: int = 0
+    engine: str = 'backtrack'
+    dfa_cache_size: int = DFA_CACHE_SIZE
+    _automaton: NFA = field(init=False, repr=False, compare=False)
+    _prefix: str = field(init=False, repr=False, compare=False)
+    _required: str = field(init=False, repr=False, compare=False)
+    _anchored: bool = field(init=False, repr=False, compare=False)
+    _end_anchored: bool = field(init=False, repr=False, compare=False)
+    # the fewest and most characters the nodes from each index on can take
+    _min_tails: tuple = field(init=False, repr=False, compare=False)
+    _max_tails: tuple = field(init=False, repr=False, compare=False)
+    _memo_hits: int = field(default=0, init=False, repr=False, compare=False)
+    _memo_misses: int = field(default=0, init=False, repr=False,
+                              compare=False)
+    _uses: int = field(default=0, init=False, repr=False, compare=False)
+    _codegen_done: bool = field(default=False, init=False, repr=False,
+                                compare=False)
+    # guards the counters and generating, patterns are shared by threads
+    _lock: Lock = field(default_factory=Lock, init=False, repr=False,
+                        compare=False)
+    _generated: FunctionType = field(default=None, init=False, repr=False,
+                                     compare=False)
+    _source: str = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self, /) -> None:
+        self._prefix, self._required = _literals(self.nodes, self.flags)
+        # anchors at either end are checked once by the pattern, not by
+        # every attempt through the nodes
+        self._anchored = bool(self.nodes) and isinstance(self.nodes[0], Start)
+        self._end_anchored = bool(self.nodes) and isinstance(self.nodes[-1],
+                                                             End)
+        min_tails = [0]
+        max_tails = [0]
+        for node in reversed(self.nodes):
+            min_tails.append(min_tails[-1] + node._min_width())
+            width = node._width()
+            max_tails.append(None if width is None or max_tails[-1] is None
+                             else max_tails[-1] + width)
+        self._min_tails = tuple(reversed(min_tails))
+        self._max_tails = tuple(reversed(max_tails))
+
+        if self.engine == 'nfa':
+            self._automaton = NFA(self.nodes)
+        elif self.engine == 'dfa':
+            # built lazily and shared by every call on this pattern
+            self._automaton = DFA(NFA(self.nodes), self.dfa_cache_size)
+        elif self.engine == 'vm':
+            self._automaton = Program(NFA(self.nodes))
+        else:
+            self._automaton = None
+
+    def memo_info(self, /) -> dict:
+        lookups = self._memo_hits + self._memo_misses
+        return {
+            'hits': self._memo_hits,
+            'misses': self._memo_misses,
+            'hit_rate': self._memo_hits / lookups if lookups else 0.0,
+        }
+
+    def memory_footprint(self, /) -> dict:
+        # bytes held by this pattern alone, by part; leaves, classes and
+        # character classes are shared with other patterns and left out
+        seen = {id(leaf) for leaf in _leaves.values()}
+        footprint = {
+            'nodes': _sizeof(self.nodes, seen),
+            'automaton': _sizeof(self._automaton, seen),
+            'generated': (_sizeof(self._generated, seen) +
+                          _sizeof(self._source, seen)),
+        }
+        # the pattern itself, its source and literals
+        footprint['total'] = sum(footprint.values()) + _sizeof(self, seen)
+        return footprint
+
+    @property
+    def dfa(self, /) -> DFA:
+        return self._automaton if self.engine == 'dfa' else None
+
+    @property
+    def source(self, /) -> str:
+        return self._source
+
+    def _hot(self, /) -> None:
+        # plain backtrack patterns are generated into a function once they
+        # have been called often enough to pay for it
+        if self._automaton is not None or self._codegen_done:
+            return
+        with self._lock:
+            self._uses += 1
+            if (
+                self._uses < CODEGEN_THRESHOLD or self._codegen_done or
+                self.flags & (DEBUG | MEMO)
+            ):
+                return
+            # tried once, patterns that can't be generated keep walking
+            self._codegen_done = True
+            source = _generate(self.nodes)
+            if source is not None:
+                namespace = {
+                    '_DECIMAL': _DECIMAL,
+                    '_WHITESPACE': _WHITESPACE,
+                    '_WORDCHAR': _WORDCHAR,
+                    'NEWLINE': NEWLINE,
+                }
+                for node in self.nodes:
+                    node = getattr(node, 'node', node)
+                    if isinstance(node, CharSet):
+                        namespace[node.table.name] = node.table
+                exec(source, namespace)
+                self._source = source
+                self._generated = namespace['match']
 
     def __repr__(self, /) -> str:
         flag_str = '.'.join(f'regex.{name}' for name, flag in FLAGS.items()
@@ -151,412 +755,1181 @@ class Pattern:
         else:
             return f'regex.compile({self.raw!r})'
 
-    @_debugable
-    def _match(self, nodes: List[Node], string: str,
-               debug_indent: int = 0, /):
-        if not nodes:
-            return Match((0, 0), '')
+    def __reduce__(self, /) -> tuple:
+        # workers rebuild the pattern through their own compile cache
+        return compile, (self.raw, self.flags, self.engine,
+                         self.dfa_cache_size)
 
-        _node, *_nodes = nodes
+    @_debugable
+    def _match(self, index: int, string: str, start: int, end: int,
+               least: int, debug_indent: int = 0, /):
+        budget = _budget.get()
+        if budget is not None:
+            budget.step()
+        # matches ending before least are rejected like failures
+        if index == len(self.nodes):
+            return start if start >= least else None
+        elif end - start < self._min_tails[index]:
+            # too little is left for the rest of the nodes
+            return
+
+        _node = self.nodes[index]
 
         if isinstance(_node, Start):
-            return self._match(nodes[1:], string, debug_indent + 1)
+            if start != 0:
+                return
+            return self._match(index + 1, string, start, end, least,
+                               debug_indent + 1)
         elif isinstance(_node, End):
-            return None if string else Match((0, len(string)), string)
-
-        if isinstance(_node, Greedy):
-            for index in range(len(string), -1, -1):
-                if _node.fullmatch(string[:index], debug_indent + 1):
-                    trailing = self._match(
-                        _nodes, string[index:],
-                        debug_indent + 1,
-                    )
-                    if trailing:
-                        return Match((0, index + trailing.span[1]),
-                                     string[:index] + trailing.match)
+            if start != end:
+                return
+            return self._match(index + 1, string, start, end, least,
+                               debug_indent + 1)
+
+        # the stops this node can take and still leave room for the rest
+        first = start + self._min_tails[index] - self._min_tails[index + 1]
+        last = end - self._min_tails[index + 1]
+        for stop in self._stops(_node, string, start, end, first, last,
+                                debug_indent + 1):
+            trailing = self._match(
+                index + 1, string, stop, end, least, debug_indent + 1,
+            )
+            if trailing is not None:
+                return trailing
+
+    def _stops(self, node: Node, string, start: int, end: int, first: int,
+               last: int, debug_indent: int, /):
+        # where node can stop between first and last, in the order to try
+        if isinstance(node, (Possessive, Atomic)):
+            # the one stop it commits to, found without looking at the
+            # nodes after it
+            stop = node._commit(string, start, end, debug_indent)
+            return [stop] if stop is not None and first <= stop <= last \
+                else []
+        elif isinstance(node, (Greedy, NonGreedy)):
+            # a repeat takes one character at a time, so it can stop
+            # anywhere from its fewest repeats up to where the characters
+            # stop matching, and nowhere else
+            upper = node._counts()[1]
+            reach = _repeat_reach(node.node, string, start, last,
+                                  last - start if upper is None else upper,
+                                  debug_indent)
+            if isinstance(node, Greedy):
+                return range(reach, first - 1, -1)
+            return range(first, reach + 1)
+        reach = min(node._reach(string, start, last, debug_indent), last)
+        return [stop for stop in range(first, reach + 1)
+                if node.fullmatch(string, start, stop, debug_indent)]
+
+    def _end(self, string: str, pos: int, endpos: int, advance: bool = False,
+             /):
+        # with advance set, an empty match is skipped for the next best one
+        if self._automaton is not None:
+            return self._automaton.match(string, pos, endpos, advance)
+        if self._generated is not None and _budget.get() is None:
+            return self._generated(string, pos, endpos, pos + advance)
+        if self._end_anchored:
+            # the match has to take the rest of the string
+            if advance and pos == endpos:
+                return
+            return self._fullmatch(0, string, pos, endpos, 0)
+        return self._match(0, string, pos, endpos, pos + advance, 0)
+
+    def _subject(self, string, /):
+        if isinstance(self.raw, bytes):
+            if isinstance(string, str):
+                raise TypeError('cannot use a bytes pattern '
+                                'on a string-like object')
+            if isinstance(string, memoryview) and string.format != 'B':
+                # spans are always offsets in bytes
+                return string.cast('B')
+        elif not isinstance(string, str):
+            raise TypeError('cannot use a string pattern '
+                            'on a bytes-like object')
+        return string
+
+    def _limited(self, max_steps: int, timeout: float, func, /, *args):
+        # func(*args) and the steps it took, which are only counted when
+        # something limits them; generated functions can't count theirs, so
+        # the nodes are walked instead
+        if max_steps is None:
+            max_steps = _limits['max_steps']
+        if timeout is None:
+            timeout = _limits['timeout']
+        if max_steps is None and timeout is None:
+            return func(*args), None
+        budget = Budget(max_steps, timeout, LimitExceeded)
+        token = _budget.set(budget)
+        try:
+            return func(*args), budget.steps
+        finally:
+            _budget.reset(token)
+
+    def match(self, string: str, /, pos: int = 0, endpos: int = None,
+              max_steps: int = None, timeout: float = None):
+        string = self._subject(string)
+        pos, endpos = _clamp(string, pos, endpos)
+        if pos > endpos:
+            return
+        self._hot()
+        end, steps = self._limited(max_steps, timeout, self._end, string,
+                                   pos, endpos)
+        return None if end is None else Match(self, string, pos, endpos,
+                                              (pos, end), steps)
+
+    def _starts(self, string: str, pos: int, endpos: int, prefix: str,
+                required: str, /):
+        if prefix:
+            index = string.find(prefix, pos, endpos)
+            while index != -1:
+                yield index
+                index = string.find(prefix, index + 1, endpos)
+            return
+
+        # no match can start after the last occurrence of the required text
+        last = string.find(required, pos, endpos) if required else endpos
+        for index in range(pos, endpos + 1):
+            if index > last:
+                last = string.find(required, index, endpos)
+                if last == -1:
+                    return
+            yield index
+
+    def search(self, string: str, /, pos: int = 0, endpos: int = None,
+               max_steps: int = None, timeout: float = None):
+        string = self._subject(string)
+        pos, endpos = _clamp(string, pos, endpos)
+        span, steps = self._limited(max_steps, timeout, self._search, string,
+                                    pos, endpos)
+        return None if span is None else Match(self, string, pos, endpos,
+                                               span, steps)
+
+    def _search(self, string, pos: int, endpos: int, /):
+        if pos > endpos:
+            return
+        if self._anchored:
+            if pos != 0:
+                return
+            self._hot()
+            end = self._end(string, pos, endpos)
+            return None if end is None else (pos, end)
+
+        if hasattr(string, 'find'):
+            prefix, required = self._prefix, self._required
         else:
-            for index in range(len(string) + 1):
-                if _node.fullmatch(string[:index], debug_indent + 1):
-                    trailing = self._match(
-                        _nodes, string[index:],
-                        debug_indent + 1,
-                    )
-                    if trailing:
-                        return Match((0, index + trailing.span[1]),
-                                     string[:index] + trailing.match)
-
-    def match(self, string: str, debug_indent: int = 0, /):
-        global _do_debug
-        if self.flags & DEBUG:
-            _do_debug = True
-        result = self._match(self.nodes, string, debug_indent)
-        _do_debug = False
-        return result
+            # memoryviews can't look for the literals
+            prefix = required = ''
+        if required and string.find(required, pos, endpos) == -1:
+            return
+        if self._end_anchored and self._max_tails[0] is not None:
+            # a match ending at endpos can't start further back than this
+            pos = max(pos, endpos - self._max_tails[0])
+
+        if self._automaton is not None:
+            return self._automaton.search(string, pos, endpos, prefix)
+
+        self._hot()
+        for start in self._starts(string, pos, endpos, prefix, required):
+            end = self._end(string, start, endpos)
+            if end is not None:
+                return start, end
+
+    def _spans(self, string, pos: int, endpos: int, retry: bool = False,
+               /):
+        # with retry set, an empty match was just found at pos; the default
+        # limits hold for the search for each match
+        while pos <= endpos:
+            if retry:
+                # like re, a non-empty match may start where an empty one did
+                retry = False
+                end = self._limited(None, None, self._end, string, pos,
+                                    endpos, True)[0]
+                if end is None:
+                    pos += 1
+                    continue
+                yield pos, end
+                pos = end
+                continue
+
+            span = self._limited(None, None, self._search, string, pos,
+                                 endpos)[0]
+            if span is None:
+                return
+            yield span
+            pos = span[1]
+            retry = span[0] == pos
+
+    def _max_width(self, /) -> int:
+        return self._max_tails[0]
+
+    def _parallel_spans(self, string, pos: int, endpos: int, workers: int,
+                        /):
+        # every segment is scanned from its start in a worker, past its end by
+        # the widest match, and the matches starting in it are kept; a match
+        # reaching into the next segment throws that segment's scan out of
+        # step, so it is scanned again from there until both agree
+        width = self._max_width()
+        size = -(-(endpos - pos) // workers)
+        if (
+            width is None or size <= width or
+            # anchors would take the ends of a segment for those of the string
+            any(isinstance(node, (Start, End)) for node in self.nodes)
+        ):
+            yield from self._spans(string, pos, endpos)
+            return
+
+        starts = range(pos, endpos, size)
+        # the last segment also holds the empty match at endpos
+        stops = [*starts[1:], endpos + 1]
+        limits = [min(stop + width, endpos) for stop in stops]
+
+        length = endpos - pos
+        wide = isinstance(string, str)
+        memory = SharedMemory(create=True, size=max(length * 4 if wide
+                                                    else length, 1))
+        try:
+            # only the searched part is shared, a segment at a time, so the
+            # string is never copied whole on its way there
+            if wide:
+                for start, stop in zip(starts, stops):
+                    stop = min(stop, endpos)
+                    memory.buf[(start - pos) * 4:(stop - pos) * 4] = \
+                        string[start:stop].encode('utf-32-le', 'surrogatepass')
+            else:
+                with memoryview(string) as view:
+                    memory.buf[:length] = view[pos:endpos]
+            with ProcessPoolExecutor(workers) as executor:
+                segments = executor.map(
+                    _segment, repeat(self), repeat(memory.name), repeat(pos),
+                    starts, stops, limits,
+                )
+                last = None
+                for start, stop, limit, spans in zip(starts, stops, limits,
+                                                     segments):
+                    if last is not None and (
+                        last[1] > start or last[1] == start == last[0]
+                    ):
+                        found = set(spans)
+                        resumed = self._spans(string, last[1], limit,
+                                              last[0] == last[1])
+                        aligned = []
+                        for span in resumed:
+                            if span[0] >= stop:
+                                break
+                            yield span
+                            last = span
+                            if span in found:
+                                aligned = spans[spans.index(span) + 1:]
+                                break
+                        spans = aligned
+                    for span in spans:
+                        yield span
+                        last = span
+        finally:
+            memory.close()
+            memory.unlink()
+
+    def _found(self, string, pos: int, endpos: int, workers: int, /):
+        # with several workers, a long string is split between processes
+        if workers < 1:
+            raise ValueError('workers must be positive')
+        if workers == 1:
+            return self._spans(string, pos, endpos)
+        return self._parallel_spans(string, pos, endpos, workers)
+
+    def finditer(self, string: str, /, pos: int = 0, endpos: int = None,
+                 workers: int = 1):
+        string = self._subject(string)
+        pos, endpos = _clamp(string, pos, endpos)
+        for span in self._found(string, pos, endpos, workers):
+            yield Match(self, string, pos, endpos, span)
+
+    def findall(self, string: str, /, pos: int = 0, endpos: int = None,
+                workers: int = 1):
+        string = self._subject(string)
+        pos, endpos = _clamp(string, pos, endpos)
+        return [_slice(string, start, end)
+                for start, end in self._found(string, pos, endpos, workers)]
+
+    def finditer_stream(self, fileobj, /, chunk_size: int = STREAM_CHUNK_SIZE):
+        # takes a file object or an iterable of strings, or of bytes for
+        # bytes patterns; spans are offsets into the whole stream
+        if hasattr(fileobj, 'read'):
+            chunks = iter(partial(fileobj.read, chunk_size), self.raw[:0])
+        else:
+            chunks = fileobj
+        # the backtracker needs the whole string, streams always run the NFA
+        if self.engine == 'nfa':
+            nfa = self._automaton
+        elif self.engine == 'dfa':
+            nfa = self._automaton.nfa
+        else:
+            nfa = NFA(self.nodes)
+        # how far the stream goes isn't known while it is read
+        for span, text in nfa.stream(chunks):
+            yield _StreamMatch(self, text, 0, None, span)
+
+    def _many(self, method: str, strings, workers: int, /) -> list:
+        strings = list(strings)
+        if workers is None:
+            workers = cpu_count() or 1
+        elif workers < 1:
+            raise ValueError('workers must be positive')
+        if workers == 1 or len(strings) < 2:
+            return [getattr(self, method)(string) for string in strings]
+
+        # a few chunks per worker, so one slow chunk doesn't hold up the rest
+        chunksize = -(-len(strings) // (workers * 4))
+        with ProcessPoolExecutor(workers) as executor:
+            spans = executor.map(partial(_call, self, method), strings,
+                                 chunksize=chunksize)
+            return [None if span is None else
+                    Match(self, string, 0, len(string), span)
+                    for string, span in zip(strings, spans)]
+
+    def match_many(self, strings, /, workers: int = None) -> list:
+        return self._many('match', strings, workers)
+
+    def fullmatch_many(self, strings, /, workers: int = None) -> list:
+        return self._many('fullmatch', strings, workers)
+
+    def _columns(self, /) -> List[Node]:
+        # anchors at either end always hold for a whole string
+        nodes = self.nodes
+        if nodes and isinstance(nodes[0], Start):
+            nodes = nodes[1:]
+        if nodes and isinstance(nodes[-1], End):
+            nodes = nodes[:-1]
+        columns = []
+        for node in nodes:
+            node_columns = node._columns()
+            if node_columns is None:
+                return None
+            columns.extend(node_columns)
+        return columns
+
+    def fullmatch_array(self, array, /):
+        # a pattern matching a fixed number of characters tests the column
+        # of each character across a U or S array at once, anything else
+        # is matched string by string
+        import numpy
+
+        array = numpy.asarray(array)
+        kind = 'S' if isinstance(self.raw, bytes) else 'U'
+        columns = self._columns()
+        if (
+            columns is None or array.dtype.kind != kind or
+            self.flags & DEBUG
+        ):
+            return numpy.fromiter(
+                (self.fullmatch(string) is not None for string in array.flat),
+                bool, array.size,
+            ).reshape(array.shape)
+
+        # the strings are padded with zeros to the width of the dtype
+        flat = numpy.ascontiguousarray(
+            array, array.dtype.newbyteorder('=')
+        ).reshape(-1)
+        width = flat.itemsize // 4 if kind == 'U' else flat.itemsize
+        if len(columns) > width:
+            return numpy.zeros(array.shape, bool)
+        found = numpy.char.str_len(flat) == len(columns)
+        if columns:
+            codes = flat.view(numpy.uint32 if kind == 'U' else numpy.uint8)
+            codes = codes.reshape(flat.size, width)
+            for index, node in enumerate(columns):
+                found &= node._mask(numpy, codes[:, index])
+        return found.reshape(array.shape)
 
     @_debugable
-    def _fullmatch(self, nodes: List[Node], string: str,
+    def _fullmatch(self, index: int, string: str, start: int, end: int,
                    debug_indent: int = 0, /):
-        if not nodes:
-            return Match((0, 0), '')
-        elif len(nodes) == 1:
-            if nodes[0].fullmatch(string, debug_indent + 1):
-                return Match((0, len(string)), string)
+        budget = _budget.get()
+        if budget is not None:
+            budget.step()
+        if index == len(self.nodes):
+            return start if start == end else None
+        elif end - start < self._min_tails[index] or (
+            self._max_tails[index] is not None and
+            end - start > self._max_tails[index]
+        ):
+            return
+        elif index == len(self.nodes) - 1 and not isinstance(
+            self.nodes[index], (Start, End, Greedy, NonGreedy, Possessive,
+                                Atomic)
+        ):
+            if self.nodes[index].fullmatch(string, start, end,
+                                           debug_indent + 1):
+                return end
             else:
                 return
 
-        _node, *_nodes = nodes
+        _node = self.nodes[index]
 
         if isinstance(_node, Start):
-            return self._fullmatch(
-                nodes[1:], string, debug_indent + 1
-            )
+            if start != 0:
+                return
+            return self._fullmatch(index + 1, string, start, end,
+                                   debug_indent + 1)
         elif isinstance(_node, End):
-            return None if string else Match((0, len(string)), string)
-
-        if isinstance(_node, Greedy):
-            for index in range(len(string), -1, -1):
-                if _node.fullmatch(string[:index], debug_indent + 1):
-                    trailing = self._fullmatch(
-                        _nodes, string[index:],
-                        debug_indent + 1,
-                    )
-                    if trailing:
-                        return Match((0, index + trailing.span[1]),
-                                     string[:index] + trailing.match)
-        else:
-            for index in range(len(string) + 1):
-                if _node.fullmatch(string[:index], debug_indent + 1):
-                    trailing = self._fullmatch(
-                        _nodes, string[index:],
-                        debug_indent + 1,
-                    )
-                    if trailing:
-                        return Match((0, index + trailing.span[1]),
-                                     string[:index] + trailing.match)
-
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        global _do_debug
-        if self.flags & DEBUG:
-            _do_debug = True
-        result = self._fullmatch(self.nodes, string, debug_indent)
-        _do_debug = False
-        return result
-
-
-@dataclass
+            if start != end:
+                return
+            return self._fullmatch(index + 1, string, start, end,
+                                   debug_indent + 1)
+
+        # the rest of the nodes take the rest of the string
+        first = start + self._min_tails[index] - self._min_tails[index + 1]
+        if self._max_tails[index + 1] is not None:
+            first = max(first, end - self._max_tails[index + 1])
+        last = end - self._min_tails[index + 1]
+        for stop in self._stops(_node, string, start, end, first, last,
+                                debug_indent + 1):
+            trailing = self._fullmatch(
+                index + 1, string, stop, end, debug_indent + 1,
+            )
+            if trailing is not None:
+                return trailing
+
+    def fullmatch(self, string: str, /, pos: int = 0, endpos: int = None,
+                  max_steps: int = None, timeout: float = None):
+        string = self._subject(string)
+        pos, endpos = _clamp(string, pos, endpos)
+        if pos > endpos:
+            return
+        self._hot()
+        end, steps = self._limited(max_steps, timeout, self._full, string,
+                                   pos, endpos)
+        return None if end is None else Match(self, string, pos, endpos,
+                                              (pos, end), steps)
+
+    def _full(self, string, pos: int, endpos: int, /):
+        if self._automaton is not None:
+            return self._automaton.fullmatch(string, pos, endpos)
+        elif self._generated is not None and _budget.get() is None:
+            # nothing short of endpos is accepted
+            return self._generated(string, pos, endpos, endpos)
+        return self._fullmatch(0, string, pos, endpos, 0)
+
+
+@_node
 class Start(Node):
     flags: int
 
+    def _width(self, /) -> int:
+        return 0
 
-@dataclass
+    def _min_width(self, /) -> int:
+        return 0
+
+    def _columns(self, /) -> None:
+        return None
+
+    def _emit(self, code: list, /) -> None:
+        code.append((START, None, None))
+
+
+@_node
 class End(Node):
     flags: int
 
+    def _width(self, /) -> int:
+        return 0
 
-@dataclass
+    def _min_width(self, /) -> int:
+        return 0
+
+    def _columns(self, /) -> None:
+        return None
+
+    def _emit(self, code: list, /) -> None:
+        code.append((END, None, None))
+
+
+@_node
 class PlainText(Node):
     value: str
     flags: int
 
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        if self.flags & IGNORECASE:
-            return string.lower() == self.value.lower()
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        if end - start != len(self.value):
+            return False
+        elif isinstance(self.value, bytes):
+            # slicing a memoryview doesn't copy the buffer
+            if self.flags & IGNORECASE:
+                return bytes(string[start:end]).lower() == self.value.lower()
+            return string[start:end] == self.value
+        elif self.flags & IGNORECASE:
+            return all(string[start + index].lower() == char
+                       for index, char in enumerate(self.value.lower()))
         else:
-            return string == self.value
+            return string.startswith(self.value, start)
+
+    def _reach(self, string: str, start: int, end: int,
+               debug_indent: int = 0, /) -> int:
+        return min(start + len(self.value), end)
+
+    def _width(self, /) -> int:
+        return len(self.value)
+
+    _min_width = _width
+
+    def _columns(self, /) -> List[Node]:
+        return [replace(self, value=self.value[index:index + 1])
+                for index in range(len(self.value))]
+
+    def _mask(self, numpy, codes, /):
+        # the node of one column, so value is one character
+        if isinstance(self.value, bytes):
+            if self.flags & IGNORECASE:
+                return numpy.isin(codes, (*self.value.lower(),
+                                          *self.value.upper()))
+            return codes == self.value[0]
+        elif self.flags & IGNORECASE:
+            # more than the upper case lowers to a character, like the
+            # Kelvin sign, so every distinct code of the column is lowered
+            values, inverse = numpy.unique(codes, return_inverse=True)
+            lower = self.value.lower()
+            return numpy.array([chr(value).lower() == lower
+                                for value in values.tolist()], bool)[inverse]
+        return codes == ord(self.value)
+
+    def _emit(self, code: list, /) -> None:
+        if self.flags & IGNORECASE and isinstance(self.value, bytes):
+            for char in self.value.lower():
+                upper = bytes((char,)).upper()[0]
+                code.append((IN, frozenset({char, upper}), None))
+        elif self.flags & IGNORECASE:
+            code.extend((CHAR_I, char, None) for char in self.value.lower())
+        else:
+            code.extend((CHAR, char, None) for char in self.value)
+
+    def _source(self, index: str, /) -> str:
+        # checks every character, the caller checks there are enough
+        if len(self.value) > 1 and not self.flags & IGNORECASE:
+            if isinstance(self.value, bytes):
+                # memoryviews have no startswith
+                end = f'{index} + {len(self.value)}'
+                return f'string[{index}:{end}] == {self.value!r}'
+            return f'string.startswith({self.value!r}, {index})'
+
+        tests = []
+        for offset, char in enumerate(self.value):
+            at = f'{index} + {offset}' if offset else index
+            at = f'string[{at}]'
+            if not self.flags & IGNORECASE:
+                tests.append(f'{at} == {char!r}')
+            elif isinstance(char, int):
+                chars = {*bytes((char,)).lower(), *bytes((char,)).upper()}
+                tests.append(f'{at} in {tuple(chars)!r}')
+            else:
+                tests.append(f'{at}.lower() == {char.lower()!r}')
+        return ' and '.join(tests)
 
 
-@dataclass
+@_node
 class Any(Node):
     flags: int
 
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
         if self.flags & DOTALL:
-            return len(string) == 1
+            return end - start == 1
         else:
-            return len(string) == 1 and string != '\n'
+            return end - start == 1 and string[start] not in NEWLINE
 
+    def _emit(self, code: list, /) -> None:
+        code.append((ANY_ALL if self.flags & DOTALL else ANY, None, None))
 
-@dataclass
+    def _mask(self, numpy, codes, /):
+        if self.flags & DOTALL:
+            return numpy.ones(codes.shape, bool)
+        return codes != ord('\n')
+
+    def _source(self, index: str, /) -> str:
+        if self.flags & DOTALL:
+            return 'True'
+        return f'string[{index}] not in NEWLINE'
+
+
+@_node
 class Decimal(Node):
     flags: int
 
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return string != '' and string in DECIMAL
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return end - start == 1 and string[start] in _DECIMAL
 
+    def _emit(self, code: list, /) -> None:
+        code.append((IN, _DECIMAL, None))
 
-@dataclass
+    def _mask(self, numpy, codes, /):
+        return _DECIMAL.mask(numpy, codes)
+
+    def _source(self, index: str, /) -> str:
+        return f'string[{index}] in _DECIMAL'
+
+
+@_node
 class NonDecimal(Node):
     flags: int
 
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return string != '' and string not in DECIMAL
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return end - start == 1 and string[start] not in _DECIMAL
 
+    def _emit(self, code: list, /) -> None:
+        code.append((NOT_IN, _DECIMAL, None))
 
-@dataclass
+    def _mask(self, numpy, codes, /):
+        return ~_DECIMAL.mask(numpy, codes)
+
+    def _source(self, index: str, /) -> str:
+        return f'string[{index}] not in _DECIMAL'
+
+
+@_node
 class Whitespace(Node):
     flags: int
 
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return string != '' and string in WHITESPACE
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return end - start == 1 and string[start] in _WHITESPACE
 
+    def _emit(self, code: list, /) -> None:
+        code.append((IN, _WHITESPACE, None))
 
-@dataclass
+    def _mask(self, numpy, codes, /):
+        return _WHITESPACE.mask(numpy, codes)
+
+    def _source(self, index: str, /) -> str:
+        return f'string[{index}] in _WHITESPACE'
+
+
+@_node
 class NonWhitespace(Node):
     flags: int
 
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return string != '' and string not in WHITESPACE
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return end - start == 1 and string[start] not in _WHITESPACE
 
+    def _emit(self, code: list, /) -> None:
+        code.append((NOT_IN, _WHITESPACE, None))
 
-@dataclass
+    def _mask(self, numpy, codes, /):
+        return ~_WHITESPACE.mask(numpy, codes)
+
+    def _source(self, index: str, /) -> str:
+        return f'string[{index}] not in _WHITESPACE'
+
+
+@_node
 class WordChar(Node):
     flags: int
 
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return string != '' and string in WORDCHAR
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return end - start == 1 and string[start] in _WORDCHAR
 
+    def _emit(self, code: list, /) -> None:
+        code.append((IN, _WORDCHAR, None))
 
-@dataclass
+    def _mask(self, numpy, codes, /):
+        return _WORDCHAR.mask(numpy, codes)
+
+    def _source(self, index: str, /) -> str:
+        return f'string[{index}] in _WORDCHAR'
+
+
+@_node
 class NonWordChar(Node):
     flags: int
 
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return string != '' and string not in WORDCHAR
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return end - start == 1 and string[start] not in _WORDCHAR
 
+    def _emit(self, code: list, /) -> None:
+        code.append((NOT_IN, _WORDCHAR, None))
 
-@dataclass
+    def _mask(self, numpy, codes, /):
+        return ~_WORDCHAR.mask(numpy, codes)
+
+    def _source(self, index: str, /) -> str:
+        return f'string[{index}] not in _WORDCHAR'
+
+
+@_node
+class CharSet(Node):
+    # a bracket class or a Unicode category, as written in the pattern
+    value: str
+    flags: int
+    table: CharClass = field(repr=False)
+
+    @_debugable
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return end - start == 1 and string[start] in self.table
+
+    def _emit(self, code: list, /) -> None:
+        code.append((IN, self.table, None))
+
+    def _mask(self, numpy, codes, /):
+        return self.table.mask(numpy, codes)
+
+    def _source(self, index: str, /) -> str:
+        return f'string[{index}] in {self.table.name}'
+
+
+@_node
 class Greedy(Node):
     node: Node
 
+    def _width(self, /) -> int:
+        upper = self._counts()[1]
+        return None if upper is None else upper * self.node._width()
 
-@dataclass
+    def _min_width(self, /) -> int:
+        return self._counts()[0] * self.node._min_width()
+
+    def _columns(self, /) -> List[Node]:
+        lower, upper = self._counts()
+        columns = self.node._columns()
+        if lower != upper or columns is None:
+            return None
+        return columns * lower
+
+    def _split(self, first: int, second: int, /) -> tuple:
+        return (SPLIT, first, second)
+
+
+@_node
 class NonGreedy(Node):
     node: Node
 
+    _width = Greedy._width
+    _min_width = Greedy._min_width
+    _columns = Greedy._columns
 
-@dataclass
+    def _split(self, first: int, second: int, /) -> tuple:
+        return (SPLIT, second, first)
+
+
+@_node
 class GreedyPositional(Greedy):
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        if self.node.fullmatch(string):
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        if self.node.fullmatch(string, start, end, debug_indent + 1):
             return True
-        for index in range(len(string), -1, -1):
-            if self.node.fullmatch(string[:index], debug_indent + 1) and (
-                self.node.fullmatch(string[index:], debug_indent + 1) or
-                self.fullmatch(string[index:], debug_indent + 1)
+        for index in range(end, start, -1):
+            if (
+                self.node.fullmatch(string, start, index, debug_indent + 1) and
+                (self.node.fullmatch(string, index, end, debug_indent + 1) or
+                 self.fullmatch(string, index, end, debug_indent + 1))
             ):
                 return True
         return False
 
+    def _reach(self, string: str, start: int, end: int,
+               debug_indent: int = 0, /) -> int:
+        return _repeat_reach(self.node, string, start, end, end - start,
+                             debug_indent)
 
-@dataclass
+    def _counts(self, /) -> Tuple[int, int]:
+        return 1, None
+
+    def _emit(self, code: list, /) -> None:
+        loop = len(code)
+        self.node._emit(code)
+        code.append(self._split(loop, len(code) + 1))
+
+
+@_node
 class NonGreedyPositional(NonGreedy):
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        for index in range(len(string) + 1):
-            if self.node.fullmatch(string[:index], debug_indent + 1) and (
-                self.node.fullmatch(string[index:], debug_indent + 1) or
-                self.fullmatch(string[index:], debug_indent + 1)
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        for index in range(start + 1, end + 1):
+            if (
+                self.node.fullmatch(string, start, index, debug_indent + 1) and
+                (self.node.fullmatch(string, index, end, debug_indent + 1) or
+                 self.fullmatch(string, index, end, debug_indent + 1))
             ):
                 return True
-        if self.node.fullmatch(string, debug_indent + 1):
+        if self.node.fullmatch(string, start, end, debug_indent + 1):
             return True
         return False
 
+    _reach = GreedyPositional._reach
+    _counts = GreedyPositional._counts
+    _emit = GreedyPositional._emit
 
-@dataclass
+
+@_node
 class GreedyOptional(Greedy):
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        if self.node.fullmatch(string):
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        if self.node.fullmatch(string, start, end, debug_indent + 1):
             return True
-        for index in range(len(string), -1, -1):
-            if self.node.fullmatch(string[:index], debug_indent + 1) and (
-                self.node.fullmatch(string[index:], debug_indent + 1) or
-                self.fullmatch(string[index:], debug_indent + 1)
+        for index in range(end, start, -1):
+            if (
+                self.node.fullmatch(string, start, index, debug_indent + 1) and
+                (self.node.fullmatch(string, index, end, debug_indent + 1) or
+                 self.fullmatch(string, index, end, debug_indent + 1))
             ):
                 return True
-        if not string:
+        if start == end:
             return True
         return False
 
+    def _reach(self, string: str, start: int, end: int,
+               debug_indent: int = 0, /) -> int:
+        return _repeat_reach(self.node, string, start, end, end - start,
+                             debug_indent)
 
-@dataclass
+    def _counts(self, /) -> Tuple[int, int]:
+        return 0, None
+
+    def _emit(self, code: list, /) -> None:
+        split = len(code)
+        code.append(None)
+        self.node._emit(code)
+        code.append((JMP, split, None))
+        code[split] = self._split(split + 1, len(code))
+
+
+@_node
 class NonGreedyOptional(NonGreedy):
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        if not string:
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        if start == end:
             return True
-        for index in range(len(string) + 1):
-            if self.node.fullmatch(string[:index], debug_indent + 1) and (
-                self.node.fullmatch(string[index:], debug_indent + 1) or
-                self.fullmatch(string[index:], debug_indent + 1)
+        for index in range(start + 1, end + 1):
+            if (
+                self.node.fullmatch(string, start, index, debug_indent + 1) and
+                (self.node.fullmatch(string, index, end, debug_indent + 1) or
+                 self.fullmatch(string, index, end, debug_indent + 1))
             ):
                 return True
-        if self.node.fullmatch(string, debug_indent + 1):
+        if self.node.fullmatch(string, start, end, debug_indent + 1):
             return True
         return False
 
+    _reach = GreedyOptional._reach
+    _counts = GreedyOptional._counts
+    _emit = GreedyOptional._emit
 
-@dataclass
+
+@_node
 class GreedyOneOrNone(Greedy):
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return not string or self.node.fullmatch(string, debug_indent + 1)
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return start == end or self.node.fullmatch(string, start, end,
+                                                   debug_indent + 1)
 
+    def _counts(self, /) -> Tuple[int, int]:
+        return 0, 1
 
-@dataclass
+    def _emit(self, code: list, /) -> None:
+        split = len(code)
+        code.append(None)
+        self.node._emit(code)
+        code[split] = self._split(split + 1, len(code))
+
+
+@_node
 class NonGreedyOneOrNone(NonGreedy):
     @_debugable
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return not string or self.node.fullmatch(string, debug_indent + 1)
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return start == end or self.node.fullmatch(string, start, end,
+                                                   debug_indent + 1)
 
+    _counts = GreedyOneOrNone._counts
+    _emit = GreedyOneOrNone._emit
 
-@dataclass
+
+@_node
 class GreedyRepeat(Greedy):
     node: Node
     count: int
 
     @classmethod
-    def _fullmatch(cls, node: Node, string: str, count: int,
-                   debug_indent: int = 0, /):
+    @_debugable
+    def _fullmatch(cls, node: Node, string: str, start: int, end: int,
+                   count: int, debug_indent: int = 0, /):
         if count == 0:
-            return False if string else True
+            return start == end
         if count == 1:
-            return node.fullmatch(string, debug_indent + 1)
-        if not string:
-            return (node.fullmatch('', debug_indent + 1) and
-                    cls._fullmatch(node, '', count - 1, debug_indent + 1))
-        for index in range(len(string), -1, -1):
+            return node.fullmatch(string, start, end, debug_indent + 1)
+        for index in range(end, start - 1, -1):
             if (
-                node.fullmatch(string[:index], debug_indent + 1) and
+                node.fullmatch(string, start, index, debug_indent + 1) and
                 cls._fullmatch(
-                    node, string[index:], count - 1, debug_indent + 1
+                    node, string, index, end, count - 1, debug_indent + 1
                 )
             ):
                 return True
         return False
 
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return self._fullmatch(self.node, string, self.count, debug_indent)
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return self._fullmatch(self.node, string, start, end, self.count,
+                               debug_indent)
 
+    def _reach(self, string: str, start: int, end: int,
+               debug_indent: int = 0, /) -> int:
+        return min(start + self.count, end)
 
-GreedyRepeat._fullmatch = _debugable(GreedyRepeat._fullmatch)
+    def _counts(self, /) -> Tuple[int, int]:
+        return self.count, self.count
 
+    def _emit(self, code: list, /) -> None:
+        for _ in range(self.count):
+            self.node._emit(code)
 
-@dataclass
+
+@_node
 class NonGreedyRepeat(NonGreedy):
     node: Node
     count: int
 
     @classmethod
-    def _fullmatch(cls, node: Node, string: str, count: int,
-                   debug_indent: int = 0, /):
+    @_debugable
+    def _fullmatch(cls, node: Node, string: str, start: int, end: int,
+                   count: int, debug_indent: int = 0, /):
         if count == 0:
-            return False if string else True
+            return start == end
         if count == 1:
-            return node.fullmatch(string, debug_indent + 1)
-        if not string:
-            return (node.fullmatch('', debug_indent + 1) and
-                    cls._fullmatch(node, '', count - 1, debug_indent + 1))
-        for index in range(len(string) + 1):
+            return node.fullmatch(string, start, end, debug_indent + 1)
+        for index in range(start, end + 1):
             if (
-                node.fullmatch(string[:index], debug_indent + 1) and
+                node.fullmatch(string, start, index, debug_indent + 1) and
                 cls._fullmatch(
-                    node, string[index:], count - 1, debug_indent + 1
+                    node, string, index, end, count - 1, debug_indent + 1
                 )
             ):
                 return True
         return False
 
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
-        return self._fullmatch(self.node, string, self.count, debug_indent)
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return self._fullmatch(self.node, string, start, end, self.count,
+                               debug_indent)
 
+    _reach = GreedyRepeat._reach
+    _counts = GreedyRepeat._counts
+    _emit = GreedyRepeat._emit
 
-NonGreedyRepeat._fullmatch = _debugable(NonGreedyRepeat._fullmatch)
 
-
-@dataclass
+@_node
 class GreedyRepeatRange(Greedy):
     node: Node
     lower: int
     upper: int
 
     @classmethod
-    def _fullmatch(cls, node: Node, string: str, lower: int, upper: int,
-                   debug_indent: int = 0, /):
+    @_debugable
+    def _fullmatch(cls, node: Node, string: str, start: int, end: int,
+                   lower: int, upper: int, debug_indent: int = 0, /):
         if upper == 0:
-            return False if string else True
-        if not string:
-            return node.fullmatch('', debug_indent + 1) and cls._fullmatch(
-                node, '', lower - 1, upper - 1, debug_indent + 1
-            )
-        for index in range(len(string), -1, -1):
+            return start == end
+        if start == end and lower <= 0:
+            return True
+        for index in range(end, start - 1, -1):
             if (
-                node.fullmatch(string[:index], debug_indent + 1) and
+                node.fullmatch(string, start, index, debug_indent + 1) and
                 cls._fullmatch(
-                    node, string[index:], lower - 1, upper - 1,
+                    node, string, index, end, lower - 1, upper - 1,
                     debug_indent + 1,
                 )
             ):
                 return True
-        if lower == 0:
-            return False if string else True
         return False
 
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
         return self._fullmatch(
-            self.node, string, self.lower, self.upper, debug_indent
+            self.node, string, start, end, self.lower, self.upper,
+            debug_indent,
         )
 
+    def _reach(self, string: str, start: int, end: int,
+               debug_indent: int = 0, /) -> int:
+        return _repeat_reach(self.node, string, start, end, self.upper,
+                             debug_indent)
 
-GreedyRepeatRange._fullmatch = _debugable(GreedyRepeatRange._fullmatch)
+    def _counts(self, /) -> Tuple[int, int]:
+        return self.lower, self.upper
 
+    def _emit(self, code: list, /) -> None:
+        for _ in range(self.lower):
+            self.node._emit(code)
+        splits = []
+        for _ in range(self.upper - self.lower):
+            splits.append(len(code))
+            code.append(None)
+            self.node._emit(code)
+        for split in splits:
+            code[split] = self._split(split + 1, len(code))
 
-@dataclass
+
+@_node
 class NonGreedyRepeatRange(NonGreedy):
     node: Node
     lower: int
     upper: int
 
     @classmethod
-    def _fullmatch(cls, node: Node, string: str, lower: int, upper: int,
-                   debug_indent: int = 0, /):
-        if lower == 0:
-            return False if string else True
-        if not string:
-            return node.fullmatch('', debug_indent + 1) and cls._fullmatch(
-                node, '', lower - 1, upper - 1, debug_indent + 1
-            )
-        for index in range(len(string) + 1):
+    @_debugable
+    def _fullmatch(cls, node: Node, string: str, start: int, end: int,
+                   lower: int, upper: int, debug_indent: int = 0, /):
+        if upper == 0:
+            return start == end
+        if start == end and lower <= 0:
+            return True
+        for index in range(start, end + 1):
             if (
-                node.fullmatch(string[:index], debug_indent + 1) and
+                node.fullmatch(string, start, index, debug_indent + 1) and
                 cls._fullmatch(
-                    node, string[index:], lower - 1, upper - 1,
+                    node, string, index, end, lower - 1, upper - 1,
                     debug_indent + 1,
                 )
             ):
                 return True
-        if upper == 0:
-            return False if string else True
         return False
 
-    def fullmatch(self, string: str, debug_indent: int = 0, /):
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
         return self._fullmatch(
-            self.node, string, self.lower, self.upper, debug_indent
+            self.node, string, start, end, self.lower, self.upper,
+            debug_indent,
+        )
+
+    _reach = GreedyRepeatRange._reach
+    _counts = GreedyRepeatRange._counts
+    _emit = GreedyRepeatRange._emit
+
+
+@_node
+class Possessive(Node):
+    node: Node
+
+    _width = Greedy._width
+    _min_width = Greedy._min_width
+    _columns = Greedy._columns
+
+    @_debugable
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        lower, upper = self._counts()
+        return (
+            lower <= end - start and (upper is None or end - start <= upper)
+            and _repeat_reach(self.node, string, start, end, end - start,
+                              debug_indent + 1) == end
         )
 
+    def _commit(self, string: str, start: int, end: int,
+                debug_indent: int = 0, /) -> int:
+        # every character it can take, or None if that's too few
+        lower, upper = self._counts()
+        stop = _repeat_reach(self.node, string, start, end,
+                             end - start if upper is None else upper,
+                             debug_indent)
+        return stop if stop - start >= lower else None
+
+    def _emit(self, code: list, /) -> None:
+        raise error('possessive repeats need the backtrack engine')
+
+
+@_node
+class PossessivePositional(Possessive):
+    def _counts(self, /) -> Tuple[int, int]:
+        return 1, None
+
+
+@_node
+class PossessiveOptional(Possessive):
+    def _counts(self, /) -> Tuple[int, int]:
+        return 0, None
+
+
+@_node
+class PossessiveOneOrNone(Possessive):
+    def _counts(self, /) -> Tuple[int, int]:
+        return 0, 1
+
+
+@_node
+class PossessiveRepeatRange(Possessive):
+    node: Node
+    lower: int
+    upper: int
+
+    def _counts(self, /) -> Tuple[int, int]:
+        return self.lower, self.upper
+
+
+@_node
+class Atomic(Node):
+    # (?>...), which keeps the first way its nodes match and never tries
+    # another; they are run by a pattern of their own
+    nodes: tuple
+    _pattern: 'Pattern' = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self, /) -> None:
+        object.__setattr__(self, '_pattern',
+                           Pattern('', list(self.nodes), engine='backtrack'))
+
+    @_debugable
+    def fullmatch(self, string: str, start: int, end: int,
+                  debug_indent: int = 0, /):
+        return self._commit(string, start, end, debug_indent + 1) == end
+
+    def _commit(self, string: str, start: int, end: int,
+                debug_indent: int = 0, /) -> int:
+        return self._pattern._match(0, string, start, end, start,
+                                    debug_indent)
+
+    def _reach(self, string: str, start: int, end: int,
+               debug_indent: int = 0, /) -> int:
+        return end
+
+    def _width(self, /) -> int:
+        return self._pattern._max_tails[0]
+
+    def _min_width(self, /) -> int:
+        return self._pattern._min_tails[0]
 
-NonGreedyRepeatRange._fullmatch = _debugable(NonGreedyRepeatRange._fullmatch)
+    def _columns(self, /) -> List[Node]:
+        # with one width every way to match ends at the same stop
+        columns = []
+        for node in self.nodes:
+            node_columns = node._columns()
+            if node_columns is None:
+                return None
+            columns.extend(node_columns)
+        return columns
 
+    def _emit(self, code: list, /) -> None:
+        raise error('atomic groups need the backtrack engine')
+
+
+_LEAF_CLASSES = {Start, End, Any, Decimal, NonDecimal, Whitespace,
+                 NonWhitespace, WordChar, NonWordChar}
 
 _escape_nodes_map = {
     'A': Start,
@@ -578,22 +1951,26 @@ _symbols_map = {
 }
 
 _count_map = {
-    '+': [GreedyPositional, NonGreedyPositional],
-    '*': [GreedyOptional, NonGreedyOptional],
-    '?': [GreedyOneOrNone, NonGreedyOneOrNone],
+    '+': [GreedyPositional, NonGreedyPositional, PossessivePositional],
+    '*': [GreedyOptional, NonGreedyOptional, PossessiveOptional],
+    '?': [GreedyOneOrNone, NonGreedyOneOrNone, PossessiveOneOrNone],
 }
 
 for char in _symbols_map:
     _escape_nodes_map[char] = char
 
-for char in 'fnrtv':
-    _escape_nodes_map[char] = char
+for char, value in zip('fnrtv', '\f\n\r\t\v'):
+    _escape_nodes_map[char] = value
 
 
 def _find_last_repeatable(nodes: List[Node]) -> Tuple[List[Node], Node]:
-    nodes = [node for node in nodes if not isinstance(node, (Start, End))]
-    if not nodes:
+    if not nodes or isinstance(nodes[-1], (Start, End)):
         raise error('got nothing to repeat')
+    if isinstance(nodes[-1], Atomic):
+        raise error('atomic groups can\'t be repeated')
+    if isinstance(nodes[-1], (Greedy, NonGreedy, Possessive)):
+        # also keeps counted repeats from multiplying into huge programs
+        raise error('multiple repeat')
     *_nodes, _node = nodes
     if isinstance(_node, PlainText):
         return ([*_nodes, PlainText(_node.value[:-1], _node.flags)],
@@ -601,7 +1978,248 @@ def _find_last_repeatable(nodes: List[Node]) -> Tuple[List[Node], Node]:
     return _nodes, _node
 
 
-def _compile(pattern: str, flags: int) -> Pattern:
+def _encoded(node: Node, /) -> Node:
+    if isinstance(node, PlainText):
+        return PlainText(node.value.encode('latin-1'), node.flags)
+    elif isinstance(node, (Greedy, NonGreedy, Possessive)):
+        return replace(node, node=_encoded(node.node))
+    return node
+
+
+def _repeated(greedy: bool, node: Node, lower: int, upper: int, /) -> Node:
+    # the repeat taking lower to upper nodes, None if no node class can
+    # stand for it
+    if upper is not None and upper > MAXREPEAT:
+        return
+    if (lower, upper) == (0, None):
+        return (GreedyOptional if greedy else NonGreedyOptional)(node)
+    elif (lower, upper) == (1, None):
+        return (GreedyPositional if greedy else NonGreedyPositional)(node)
+    elif upper is None:
+        return
+    elif (lower, upper) == (0, 1):
+        return (GreedyOneOrNone if greedy else NonGreedyOneOrNone)(node)
+    elif lower == upper:
+        return (GreedyRepeat if greedy else NonGreedyRepeat)(node, lower)
+    return (GreedyRepeatRange if greedy else NonGreedyRepeatRange)(
+        node, lower, upper,
+    )
+
+
+def _fused(first: Node, second: Node, /) -> Node:
+    # one node matching what first and then second do, or None; repeats of
+    # one character are fused with each other and with that character, and
+    # always take the longest (or shortest) total length either way
+    if isinstance(second, (Greedy, NonGreedy)):
+        if not isinstance(first, (Greedy, NonGreedy)):
+            first, second = second, first
+    if not isinstance(first, (Greedy, NonGreedy)):
+        return
+    lower, upper = first._counts()
+    if isinstance(second, (Greedy, NonGreedy)):
+        if (
+            isinstance(first, Greedy) != isinstance(second, Greedy) or
+            first.node != second.node
+        ):
+            return
+        second_lower, second_upper = second._counts()
+    elif first.node == second:
+        second_lower = second_upper = 1
+    else:
+        return
+    return _repeated(
+        isinstance(first, Greedy), first.node, lower + second_lower,
+        None if upper is None or second_upper is None
+        else upper + second_upper,
+    )
+
+
+def _optimized(nodes: List[Node], /) -> List[Node]:
+    # a shorter list of nodes matching the same strings the same way: empty
+    # nodes are dropped, repeats of one character fused, literals merged
+    # and nothing kept past a node that can never match; anchors stay in
+    # the list for the automata, the backtracker checks them once
+    result = []
+    # characters of the literal a match starts with, which searches look
+    # for and which are kept out of repeats
+    leading = True
+    ended = consumed = False
+    for node in nodes:
+        if isinstance(node, PlainText):
+            singles = [PlainText(node.value[index:index + 1], node.flags)
+                       for index in range(len(node.value))]
+        elif isinstance(node, (Greedy, NonGreedy)) and node._counts()[1] == 0:
+            singles = []
+        elif isinstance(node, Atomic):
+            inner = _optimized(list(node.nodes))
+            # nodes that match only one way have nothing to give back
+            singles = [Atomic(tuple(inner))] if any(
+                isinstance(kept, (Greedy, NonGreedy)) for kept in inner
+            ) else inner
+        else:
+            singles = [node]
+        for node in singles:
+            if (
+                isinstance(node, (Start, End)) and result and
+                type(result[-1]) is type(node)
+            ):
+                continue
+            if (
+                ended and node._min_width() > 0 or
+                consumed and isinstance(node, Start)
+            ):
+                # no match gets past this node, so the rest is never tried
+                result.append(node)
+                return _merged_text(result)
+            ended = ended or isinstance(node, End)
+            consumed = consumed or node._min_width() > 0
+            locked = leading
+            leading = leading and isinstance(node, (Start, PlainText))
+            while result and not locked:
+                fused = _fused(result[-1], node)
+                if fused is None:
+                    break
+                node = fused
+                result.pop()
+            result.append(node)
+    return _merged_text(result)
+
+
+def _merged_text(nodes: List[Node], /) -> List[Node]:
+    result = []
+    for is_text, group in groupby(
+        nodes, lambda node: isinstance(node, PlainText) and (node.flags,),
+    ):
+        group = list(group)
+        if is_text:
+            # bytes and str values both join on an empty slice
+            group = [PlainText(group[0].value[:0].join(
+                node.value for node in group
+            ), group[0].flags)]
+        result.extend(group)
+    return result
+
+
+def _group_end(pattern: str, pos: int, flags: int, is_bytes: bool,
+               /) -> int:
+    # the ) closing the group opened at pos, other parentheses are plain
+    # characters but still have to pair up inside it
+    depth = 0
+    index = pos + 3
+    while index < len(pattern):
+        char = pattern[index]
+        if char == '\\':
+            index += 1
+        elif char == '[':
+            index = _charset(pattern, index, flags, is_bytes)[1]
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            if depth == 0:
+                return index
+            depth -= 1
+        index += 1
+    raise error(f'missing ), unterminated subpattern at position {pos}')
+
+
+def _class_escape(pattern: str, pos: int, is_bytes: bool, /):
+    # the escape at pos inside a set, as a character code or a list of
+    # ranges, and the index after it
+    if pos == len(pattern) - 1:
+        raise error(f'bad escape (end of pattern) at position {pos}')
+    char = pattern[pos + 1]
+    if char in {'d', 'D', 's', 'S', 'w', 'W'}:
+        table = {'d': DIGIT, 's': SPACE, 'w': WORD}[char.lower()]
+        ranges = table.byte_ranges() if is_bytes else table.ranges()
+        if char.isupper():
+            ranges = complement(ranges, 255 if is_bytes else 0x10ffff)
+        return ranges, pos + 2
+    elif char in {'p', 'P'}:
+        if is_bytes:
+            raise error(f'bad escape \\{char} at position {pos}')
+        close = pattern.find('}', pos)
+        if pattern[pos + 2:pos + 3] != '{' or close == -1:
+            raise error(f'missing {{...}} after \\{char} at position {pos}')
+        name = pattern[pos + 3:close]
+        try:
+            ranges = category_ranges(name)
+        except KeyError:
+            raise error(f'unknown property {name!r} at position {pos}')
+        if char == 'P':
+            ranges = complement(ranges)
+        return ranges, close + 1
+    elif char in {'x', 'X'}:
+        digits = pattern[pos + 2:pos + 4]
+        if len(digits) != 2 or not {*digits} <= HEXADECIMAL:
+            raise error('invalid hexadecimal literal escape')
+        return int(digits, base=16), pos + 4
+    elif char == '0':
+        digits = pattern[pos + 2:pos + 4]
+        if len(digits) == 2 and {*digits} <= OCTAL:
+            return int(digits, base=8), pos + 4
+        return 0, pos + 2
+    elif char in _escape_nodes_map and isinstance(
+        _escape_nodes_map[char], str
+    ):
+        return ord(_escape_nodes_map[char]), pos + 2
+    elif char.isascii() and char.isalnum():
+        raise error(f'bad escape \\{char} at position {pos}')
+    return ord(char), pos + 2
+
+
+def _charset(pattern: str, pos: int, flags: int, is_bytes: bool, /):
+    # the set starting with the [ at pos and the index of its closing ]
+    index = pos + 1
+    negated = pattern[index:index + 1] == '^'
+    index += negated
+    ranges = []
+    first = index
+
+    while True:
+        if index >= len(pattern):
+            raise error(f'unterminated character set at position {pos}')
+        char = pattern[index]
+        if char == ']' and index > first:
+            break
+        if char == '\\':
+            low, index = _class_escape(pattern, index, is_bytes)
+        else:
+            low, index = ord(char), index + 1
+        if isinstance(low, list):
+            if (
+                pattern[index:index + 1] == '-' and
+                pattern[index + 1:index + 2] not in {'', ']'}
+            ):
+                raise error(f'bad character range at position {pos}')
+            ranges.extend(low)
+            continue
+
+        if (
+            pattern[index:index + 1] == '-' and
+            pattern[index + 1:index + 2] not in {'', ']'}
+        ):
+            if pattern[index + 1] == '\\':
+                high, index = _class_escape(pattern, index + 1, is_bytes)
+            else:
+                high, index = ord(pattern[index + 1]), index + 2
+            if isinstance(high, list) or high < low:
+                raise error(f'bad character range at position {pos}')
+            ranges.append((low, high))
+        else:
+            ranges.append((low, low))
+
+    if flags & IGNORECASE:
+        ranges = folded(ranges, is_bytes)
+    if negated:
+        ranges = complement(sorted(ranges), 255 if is_bytes else 0x10ffff)
+    return CharSet(pattern[pos:index + 1], flags, charclass(ranges)), index
+
+
+def _parse(raw: str, flags: int, /) -> List[Node]:
+    # bytes patterns are parsed as latin-1 text, which maps every byte to the
+    # character with the same value
+    is_bytes = isinstance(raw, bytes)
+    pattern = raw.decode('latin-1') if is_bytes else raw
     nodes = []
     skip = 0
 
@@ -618,7 +2236,7 @@ def _compile(pattern: str, flags: int) -> Pattern:
                 if pos + 3 > len(pattern) - 1:
                     nodes.append(PlainText('\x00', flags))
                     skip = 1
-                if pattern[pos + 2] in OCTAL and pattern[pos + 3] in OCTAL:
+                elif pattern[pos + 2] in OCTAL and pattern[pos + 3] in OCTAL:
                     nodes.append(PlainText(chr(int(
                         pattern[pos + 2] + pattern[pos + 3], base=8
                     )), flags))
@@ -627,6 +2245,14 @@ def _compile(pattern: str, flags: int) -> Pattern:
                     nodes.append(PlainText('\x00', flags))
                     skip = 1
                 continue
+            elif next_char in {'p', 'P'}:
+                ranges, end = _class_escape(pattern, pos, is_bytes)
+                if flags & IGNORECASE:
+                    ranges = folded(ranges)
+                nodes.append(CharSet(pattern[pos:end], flags,
+                                     charclass(ranges)))
+                skip = end - pos - 1
+                continue
             elif next_char in {'X', 'x'}:
                 if (
                     pos + 3 <= len(pattern) - 1 and
@@ -635,30 +2261,38 @@ def _compile(pattern: str, flags: int) -> Pattern:
                 ):
                     nodes.append(PlainText(chr(int(
                         pattern[pos + 2] + pattern[pos + 3], base=16
-                    ))))
+                    )), flags))
                     skip = 3
                     continue
                 else:
                     raise error('invalid hexadecimal literal escape')
             else:
                 if next_char in _escape_nodes_map:
-                    nodes.append(_escape_nodes_map[next_char](flags))
+                    escaped = _escape_nodes_map[next_char]
+                    if isinstance(escaped, str):
+                        nodes.append(PlainText(escaped, flags))
+                    else:
+                        nodes.append(_leaf(escaped, flags))
                 elif next_char in _escape_needed_char:
-                    nodes.append(PlainText(next_char))
+                    nodes.append(PlainText(next_char, flags))
                 else:
-                    nodes.append(PlainText(f'\\{next_char}'))
+                    nodes.append(PlainText(f'\\{next_char}', flags))
                 skip = 1
         elif char in _count_map:
             if pos < len(pattern) - 1 and pattern[pos + 1] == '?':
                 nodes, node = _find_last_repeatable(nodes)
                 nodes.append(_count_map[char][1](node))
                 skip = 1
+            elif pos < len(pattern) - 1 and pattern[pos + 1] == '+':
+                nodes, node = _find_last_repeatable(nodes)
+                nodes.append(_count_map[char][2](node))
+                skip = 1
             else:
                 nodes, node = _find_last_repeatable(nodes)
                 nodes.append(_count_map[char][0](node))
         elif char == '{':
             if pos == len(pattern) - 1:
-                nodes.append(PlainText('{'))
+                nodes.append(PlainText('{', flags))
                 continue
             is_two = False
             nums = []
@@ -684,27 +2318,49 @@ def _compile(pattern: str, flags: int) -> Pattern:
             else:
                 broken = True
             if not nums or broken:
-                nodes.append(PlainText('{'))
+                nodes.append(PlainText('{', flags))
                 continue
+            lower = int(nums[0] or '0')
+            if len(nums) == 2 and not nums[1]:
+                raise error(f'unbounded repeat is not supported '
+                            f'at position {pos}')
+            upper = int(nums[-1])
+            if upper > MAXREPEAT:
+                raise error(f'the repetition number is too large '
+                            f'at position {pos}')
+            if lower > upper:
+                raise error(f'min repeat greater than max repeat '
+                            f'at position {pos}')
             nodes, node = _find_last_repeatable(nodes)
-            if index != len(pattern) - 1 and pattern(index + 1) == '?':
+            if index != len(pattern) - 1 and pattern[index + 1] == '?':
                 skip = index + 1 - pos
                 if len(nums) == 1:
-                    nodes.append(NonGreedyRepeat(node, int(nums[0])))
+                    nodes.append(NonGreedyRepeat(node, lower))
                 else:
-                    nodes.append(NonGreedyRepeatRange(
-                        node, int(nums[0]), int(nums[1])
-                    ))
+                    nodes.append(NonGreedyRepeatRange(node, lower, upper))
+            elif index != len(pattern) - 1 and pattern[index + 1] == '+':
+                skip = index + 1 - pos
+                if len(nums) == 1:
+                    # a fixed count has nothing to give back
+                    nodes.append(GreedyRepeat(node, lower))
+                else:
+                    nodes.append(PossessiveRepeatRange(node, lower, upper))
             else:
                 skip = index - pos
                 if len(nums) == 1:
-                    nodes.append(GreedyRepeat(node, int(nums[0])))
+                    nodes.append(GreedyRepeat(node, lower))
                 else:
-                    nodes.append(GreedyRepeatRange(
-                        node, int(nums[0]), int(nums[1])
-                    ))
+                    nodes.append(GreedyRepeatRange(node, lower, upper))
+        elif char == '[':
+            node, end = _charset(pattern, pos, flags, is_bytes)
+            nodes.append(node)
+            skip = end - pos
+        elif pattern.startswith('(?>', pos):
+            end = _group_end(pattern, pos, flags, is_bytes)
+            nodes.append(Atomic(tuple(_parse(raw[pos + 3:end], flags))))
+            skip = end - pos
         elif char in _symbols_map:
-            nodes.append(_symbols_map[char](flags))
+            nodes.append(_leaf(_symbols_map[char], flags))
         else:
             nodes.append(PlainText(char, flags))
 
@@ -730,34 +2386,131 @@ def _compile(pattern: str, flags: int) -> Pattern:
         is_plain = False
         tokens.append(PlainText(plain, flags))
 
-    return Pattern(pattern, tokens, flags)
-
-
-_cache = {}
+    if is_bytes:
+        tokens = [_encoded(node) for node in tokens]
+    return tokens
+
+
+def _compile(raw: str, flags: int, engine: str = 'auto',
+             dfa_cache_size: int = DFA_CACHE_SIZE) -> Pattern:
+    disk_cache = _disk_cache
+    tokens = None if disk_cache is None else disk_cache.load(raw, flags)
+    if tokens is None:
+        tokens = _parse(raw, flags)
+        if not flags & (DEBUG | MEMO):
+            # traces and memos show the nodes as they were written
+            tokens = _optimized(tokens)
+        if disk_cache is not None:
+            disk_cache.store(raw, flags, tokens)
+
+    if engine == 'auto':
+        # only the backtracker can trace or memoize its execution, or commit
+        # to a stop
+        engine = 'backtrack' if flags & (DEBUG | MEMO) or any(
+            isinstance(node, (Possessive, Atomic)) for node in tokens
+        ) else 'nfa'
+    elif flags & (DEBUG | MEMO) and engine != 'backtrack':
+        raise error(f'DEBUG and MEMO need the backtrack engine, '
+                    f'not {engine!r}')
+
+    compiled = Pattern(raw, tokens, flags, engine, dfa_cache_size)
+    if flags & DEBUG:
+        compiled = _traced(compiled)
+    if flags & MEMO:
+        compiled = _memoized(compiled)
+    return compiled
+
+
+# where parsed patterns are kept across processes, set by enable_disk_cache
+_disk_cache: DiskCache = None
+
+# compiled patterns by their arguments, least recently used first
+_cache: 'OrderedDict[tuple, Pattern]' = OrderedDict()
+_cache_lock = Lock()
+_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
 _MAXCACHE = 512
 
 
-def compile(pattern: str, flags: int = 0) -> Pattern:
-    if (pattern, flags) in _cache:
-        return _cache[pattern, flags]
-
+def compile(pattern: str, flags: int = 0, engine: str = 'auto',
+            dfa_cache_size: int = DFA_CACHE_SIZE) -> Pattern:
     if isinstance(pattern, Pattern):
         if flags:
             raise ValueError('cannot process flags argument '
                              'with a compiled pattern')
         return pattern
-    if not isinstance(pattern, str):
+    if not isinstance(pattern, (str, bytes)):
         raise TypeError('first argument must be string or compiled pattern')
 
-    p = _compile(pattern, flags)
-    if len(_cache) >= _MAXCACHE:
-        try:
-            del _cache[next(iter(_cache))]
-        except (StopIteration, RuntimeError, KeyError):
-            pass
-    _cache[pattern, flags] = p
-    return p
+    key = (type(pattern), pattern, flags, engine, dfa_cache_size)
+    with _cache_lock:
+        compiled = _cache.get(key)
+        if compiled is not None:
+            _cache.move_to_end(key)
+            _cache_stats['hits'] += 1
+            return compiled
+        _cache_stats['misses'] += 1
+
+    if engine not in ENGINES:
+        raise ValueError(f'unknown engine {engine!r}')
+    if dfa_cache_size < 1:
+        raise ValueError('dfa_cache_size must be positive')
+
+    # compiled without the lock, a thread compiling the same pattern at the
+    # same time keeps the copy stored first
+    compiled = _compile(pattern, flags, engine, dfa_cache_size)
+    with _cache_lock:
+        compiled = _cache.setdefault(key, compiled)
+        _cache.move_to_end(key)
+        _evict()
+    return compiled
+
+
+def _evict() -> None:
+    # the caller holds the lock
+    while len(_cache) > _MAXCACHE:
+        _cache.popitem(last=False)
+        _cache_stats['evictions'] += 1
+
+
+def cache_info() -> dict:
+    with _cache_lock:
+        return {**_cache_stats, 'size': len(_cache), 'max_size': _MAXCACHE}
+
+
+def set_cache_size(size: int, /) -> None:
+    global _MAXCACHE
+    if size < 0:
+        raise ValueError('cache size must not be negative')
+    with _cache_lock:
+        _MAXCACHE = size
+        _evict()
+
+
+def enable_disk_cache(path: str, /) -> None:
+    global _disk_cache
+    # the package has been imported by the time this is called
+    from . import __version__
+    _disk_cache = DiskCache(path, __version__)
+
+
+def disable_disk_cache() -> None:
+    global _disk_cache
+    _disk_cache = None
+
+
+def set_limits(max_steps: int = None, timeout: float = None) -> None:
+    # the limits of backtracking calls that don't pass their own, None for
+    # no limit
+    if max_steps is not None and max_steps < 0:
+        raise ValueError('max_steps must not be negative')
+    if timeout is not None and timeout < 0:
+        raise ValueError('timeout must not be negative')
+    _limits['max_steps'] = max_steps
+    _limits['timeout'] = timeout
 
 
 def purge() -> None:
-    _cache.clear()
+    with _cache_lock:
+        _cache.clear()
+        for name in _cache_stats:
+            _cache_stats[name] = 0
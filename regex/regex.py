@@ -15,7 +15,7 @@ __all__ = [
 
 
 def search(pattern, string, flags=0):
-    pass
+    return compile(pattern, flags).search(string)
 
 
 def match(pattern, string, flags=0):
@@ -31,11 +31,11 @@ def split(pattern, string, maxsplit=0, flags=0):
 
 
 def findall(pattern, string, flags=0):
-    pass
+    return compile(pattern, flags).findall(string)
 
 
 def finditer(pattern, string, flags=0):
-    pass
+    return compile(pattern, flags).finditer(string)
 
 
 def sub(pattern, repl, string, count=0, flags=0):
@@ -0,0 +1,280 @@
+from threading import Lock
+from typing import Dict, Iterable, List, Tuple
+
+from .dfa import DFA_CACHE_SIZE
+from .nfa import START, END, SPLIT, JMP, MATCH, NFA, consumes
+from .pattern import IGNORECASE, PlainText, _clamp, compile
+
+
+__all__ = [
+    'RegexSet',
+]
+
+
+class _State:
+    __slots__ = ('threads', 'search', 'accepts', 'next', 'eof')
+
+    def __init__(self, threads: Tuple[int, ...], search: bool,
+                 accepts: frozenset, /) -> None:
+        self.threads = threads
+        # searching states start every pattern again after each character
+        self.search = search
+        # the patterns one of the threads has matched
+        self.accepts = accepts
+        self.next: Dict[object, '_State'] = {}
+        self.eof = None
+
+
+class RegexSet:
+    # literal patterns go into one Aho-Corasick trie and the rest into one
+    # NFA, whose states are built lazily into a DFA, so a scan reads every
+    # character once however many patterns there are
+    def __init__(self, patterns: Iterable, /, flags: int = 0,
+                 dfa_cache_size: int = DFA_CACHE_SIZE) -> None:
+        if dfa_cache_size < 1:
+            raise ValueError('dfa_cache_size must be positive')
+        # only the nodes are used, so no automaton is built for each pattern
+        self.patterns = tuple(compile(pattern, flags, 'backtrack')
+                              for pattern in patterns)
+        if len({type(pattern.raw) for pattern in self.patterns}) > 1:
+            raise TypeError('cannot mix string and bytes patterns')
+        self.dfa_cache_size = dfa_cache_size
+
+        # trie nodes are indices into these lists, 0 is the root
+        self._goto: List[dict] = [{}]
+        self._fail: List[int] = [0]
+        # the patterns whose literal ends at each node, and those plus the
+        # ones ending at its failure links, which are suffixes of its text
+        self._ends: List[Tuple[int, ...]] = [()]
+        self._out: List[Tuple[int, ...]] = [()]
+        code = []
+        self._entries: List[int] = []
+
+        for number, pattern in enumerate(self.patterns):
+            if (
+                not pattern.flags & IGNORECASE and
+                all(isinstance(node, PlainText) for node in pattern.nodes)
+            ):
+                self._insert(number, pattern.raw[:0].join(
+                    node.value for node in pattern.nodes
+                ))
+                continue
+            # the pattern's NFA relocated to the end of the shared one, with
+            # its MATCH telling which pattern it belongs to
+            offset = len(code)
+            self._entries.append(offset)
+            for op, a, b in NFA(pattern.nodes).code:
+                if op == SPLIT:
+                    code.append((op, a + offset, b + offset))
+                elif op == JMP:
+                    code.append((op, a + offset, b))
+                elif op == MATCH:
+                    code.append((op, number, b))
+                else:
+                    code.append((op, a, b))
+        self._code = code
+        self._link()
+
+        self._states: Dict[tuple, _State] = {}
+        self._starts: Dict[tuple, _State] = {}
+        self._size = 0
+        # held while states are built, like the lock of DFA
+        self._lock = Lock()
+
+    def __repr__(self, /) -> str:
+        return f'<regex.RegexSet object; {len(self.patterns)} patterns>'
+
+    def __len__(self, /) -> int:
+        return len(self.patterns)
+
+    def _insert(self, number: int, literal, /) -> None:
+        goto = self._goto
+        node = 0
+        for char in literal:
+            target = goto[node].get(char)
+            if target is None:
+                target = goto[node][char] = len(goto)
+                goto.append({})
+                self._fail.append(0)
+                self._ends.append(())
+                self._out.append(())
+            node = target
+        self._ends[node] += (number,)
+        self._out[node] += (number,)
+
+    def _link(self, /) -> None:
+        # breadth first, so the failure link of a node is the longest proper
+        # suffix of its text in the trie and is linked before the node is
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = list(goto[0].values())
+        for node in queue:
+            for char, target in goto[node].items():
+                link = fail[node]
+                while link and char not in goto[link]:
+                    link = fail[link]
+                fail[target] = goto[link].get(char, 0)
+                out[target] += out[fail[target]]
+                queue.append(target)
+
+    def _subject(self, string, /):
+        if self.patterns:
+            return self.patterns[0]._subject(string)
+        return string
+
+    def _follow(self, pcs: Iterable[int], at_start: bool, at_end: bool,
+                threads: list, seen: set, /) -> None:
+        # END stays in the thread list until the end of the string is known
+        code = self._code
+        stack = list(pcs)
+        while stack:
+            pc = stack.pop()
+            if pc in seen:
+                continue
+            seen.add(pc)
+            op, a, b = code[pc]
+            if op == JMP:
+                stack.append(a)
+            elif op == SPLIT:
+                stack.append(b)
+                stack.append(a)
+            elif op == START:
+                if at_start:
+                    stack.append(pc + 1)
+            elif op == END and at_end:
+                stack.append(pc + 1)
+            else:
+                threads.append(pc)
+
+    def clear(self, /) -> None:
+        with self._lock:
+            self._clear()
+
+    def _clear(self, /) -> None:
+        for state in self._states.values():
+            state.next.clear()
+        self._states.clear()
+        self._starts.clear()
+        self._size = 0
+
+    def _state(self, threads: list, search: bool, /) -> _State:
+        key = (tuple(sorted(threads)), search)
+        state = self._states.get(key)
+        if state is None:
+            if self._size >= self.dfa_cache_size:
+                # the state being left is rebuilt from its threads if needed
+                self._clear()
+            code = self._code
+            state = self._states[key] = _State(key[0], search, frozenset(
+                code[pc][1] for pc in key[0] if code[pc][0] == MATCH
+            ))
+            self._size += 1
+        return state
+
+    def _start(self, at_start: bool, search: bool, /) -> _State:
+        state = self._starts.get((at_start, search))
+        if state is None:
+            with self._lock:
+                state = self._starts.get((at_start, search))
+                if state is None:
+                    threads = []
+                    self._follow(self._entries, at_start, False, threads,
+                                 set())
+                    state = self._state(threads, search)
+                    self._starts[at_start, search] = state
+        return state
+
+    def _transition(self, state: _State, char, /) -> _State:
+        with self._lock:
+            target = state.next.get(char)
+            if target is None:
+                target = self._build(state, char)
+        return target
+
+    def _build(self, state: _State, char, /) -> _State:
+        code = self._code
+        threads = []
+        seen = set()
+        for pc in state.threads:
+            op = code[pc][0]
+            if op != MATCH and op != END and consumes(code[pc], char):
+                self._follow((pc + 1,), False, False, threads, seen)
+        if state.search:
+            self._follow(self._entries, False, False, threads, seen)
+        target = state.next[char] = self._state(threads, state.search)
+        self._size += 1
+        return target
+
+    def _eof(self, state: _State, at_start: bool, /) -> frozenset:
+        if state.eof is not None and not at_start:
+            return state.eof
+        code = self._code
+        threads = []
+        self._follow([pc + 1 for pc in state.threads if code[pc][0] == END],
+                     at_start, True, threads, set())
+        eof = frozenset(code[pc][1] for pc in threads if code[pc][0] == MATCH)
+        if not at_start:
+            state.eof = eof
+        return eof
+
+    def _scan(self, string, pos: int, endpos: int, search: bool,
+              /) -> set:
+        if not self._entries:
+            return set()
+        state = self._start(pos == 0, search)
+        matched = set()
+
+        for index in range(pos, endpos):
+            if state.accepts:
+                matched |= state.accepts
+            if not state.threads or len(matched) == len(self._entries):
+                return matched
+            char = string[index]
+            target = state.next.get(char)
+            if target is None:
+                target = self._transition(state, char)
+            state = target
+
+        matched |= state.accepts
+        matched |= self._eof(state, endpos == 0)
+        return matched
+
+    def matches(self, string, /, pos: int = 0,
+                endpos: int = None) -> List[int]:
+        # the patterns that match at pos, in the order they were given
+        string = self._subject(string)
+        pos, endpos = _clamp(string, pos, endpos)
+        if pos > endpos:
+            return []
+
+        # a literal matching at pos is the whole text walked from the root,
+        # never only a suffix of it
+        goto, ends = self._goto, self._ends
+        matched = self._scan(string, pos, endpos, False)
+        matched.update(ends[0])
+        node = 0
+        for index in range(pos, endpos):
+            node = goto[node].get(string[index])
+            if node is None:
+                break
+            matched.update(ends[node])
+        return sorted(matched)
+
+    def searches(self, string, /, pos: int = 0,
+                 endpos: int = None) -> List[int]:
+        # the patterns that match anywhere between pos and endpos
+        string = self._subject(string)
+        pos, endpos = _clamp(string, pos, endpos)
+        if pos > endpos:
+            return []
+
+        goto, fail, out = self._goto, self._fail, self._out
+        matched = self._scan(string, pos, endpos, True)
+        matched.update(out[0])
+        node = 0
+        for index in range(pos, endpos):
+            char = string[index]
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            matched.update(out[node])
+        return sorted(matched)
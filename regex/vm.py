@@ -0,0 +1,166 @@
+from array import array
+from marshal import dumps, loads
+from typing import Optional, Tuple
+
+from .charclass import CharClass, DIGIT, SPACE, WORD, charclass
+from .limits import budget
+from .nfa import (CHAR, CHAR_I, IN, NOT_IN, ANY, ANY_ALL, START, END, SPLIT,
+                  JMP, NEWLINE, NFA)
+
+
+__all__ = [
+    'Program',
+]
+
+
+# classes marshal by name, the rest of them by their ranges
+_NAMED = {table.name: table for table in (DIGIT, SPACE, WORD)}
+
+# how a run treats the MATCH instruction
+_MATCH = 0
+_FULLMATCH = 1
+_ADVANCE = 2  # no empty match
+
+
+class Program:
+    # the NFA instructions flattened into (opcode, a, b) triples of one array,
+    # jump targets are offsets into it and characters and sets are indices
+    # into consts, so the whole program is plain data
+    __slots__ = ('code', 'consts')
+
+    def __init__(self, nfa: NFA, /) -> None:
+        code = array('l')
+        consts = []
+        const_index = {}
+        for op, a, b in nfa.code:
+            if op in {CHAR, CHAR_I, IN, NOT_IN}:
+                if a not in const_index:
+                    const_index[a] = len(consts)
+                    consts.append(a)
+                code.extend((op, const_index[a], 0))
+            elif op == SPLIT:
+                code.extend((op, a * 3, b * 3))
+            elif op == JMP:
+                code.extend((op, a * 3, 0))
+            else:
+                code.extend((op, 0, 0))
+        self.code = code
+        self.consts = tuple(consts)
+
+    def __repr__(self, /) -> str:
+        return f'<regex.Program object; {len(self.code) // 3} instructions>'
+
+    def __getstate__(self, /) -> tuple:
+        return self.code, self.consts
+
+    def __setstate__(self, state: tuple, /) -> None:
+        self.code, self.consts = state
+
+    def dumps(self, /) -> bytes:
+        consts = []
+        for const in self.consts:
+            if isinstance(const, CharClass):
+                reduced = const.__reduce__()
+                const = (reduced,) if isinstance(reduced, str) else reduced[1]
+            consts.append(const)
+        return dumps((self.code.tobytes(), tuple(consts)))
+
+    @classmethod
+    def loads(cls, data: bytes, /) -> 'Program':
+        code, consts = loads(data)
+        program = cls.__new__(cls)
+        program.code = array('l')
+        program.code.frombytes(code)
+        program.consts = tuple(
+            (_NAMED[const[0]] if len(const) == 1 else charclass(*const))
+            if isinstance(const, tuple) else const for const in consts
+        )
+        return program
+
+    def _run(self, string, pos: int, endpos: int, mode: int, visited: set,
+             /) -> Optional[int]:
+        # depth first in priority order, so the first MATCH reached is the
+        # one the backtracker would find; a (pc, index) pair that was already
+        # tried can only fail again and is never tried twice
+        code = self.code
+        consts = self.consts
+        width = len(code)
+        limit = budget.get()
+        stack = [pos, 0]
+
+        while stack:
+            pc = stack.pop()
+            index = stack.pop()
+            while True:
+                key = index * width + pc
+                if key in visited:
+                    break
+                visited.add(key)
+                if limit is not None:
+                    limit.step()
+                op = code[pc]
+
+                if op <= ANY_ALL:
+                    if index >= endpos:
+                        break
+                    char = string[index]
+                    const = consts[code[pc + 1]] if op <= NOT_IN else None
+                    if not (
+                        op == CHAR and char == const or
+                        op == IN and char in const or
+                        op == NOT_IN and char not in const or
+                        op == ANY and char not in NEWLINE or
+                        op == CHAR_I and char.lower() == const or
+                        op == ANY_ALL
+                    ):
+                        break
+                    pc += 3
+                    index += 1
+                elif op == SPLIT:
+                    stack.append(index)
+                    stack.append(code[pc + 2])
+                    pc = code[pc + 1]
+                elif op == JMP:
+                    pc = code[pc + 1]
+                elif op == START:
+                    if index != 0:
+                        break
+                    pc += 3
+                elif op == END:
+                    if index != endpos:
+                        break
+                    pc += 3
+                elif (
+                    mode == _FULLMATCH and index != endpos or
+                    mode == _ADVANCE and index == pos
+                ):
+                    break
+                else:
+                    return index
+
+    def search(self, string, pos: int, endpos: int, prefix: str = '',
+               /) -> Optional[Tuple[int, int]]:
+        # what failed from one start fails from the next, so every start
+        # shares the pairs already tried
+        visited = set()
+        if prefix:
+            start = string.find(prefix, pos, endpos)
+            while start != -1:
+                end = self._run(string, start, endpos, _MATCH, visited)
+                if end is not None:
+                    return start, end
+                start = string.find(prefix, start + 1, endpos)
+            return
+
+        for start in range(pos, endpos + 1):
+            end = self._run(string, start, endpos, _MATCH, visited)
+            if end is not None:
+                return start, end
+
+    def match(self, string, pos: int, endpos: int, advance: bool = False,
+              /) -> Optional[int]:
+        mode = _ADVANCE if advance else _MATCH
+        return self._run(string, pos, endpos, mode, set())
+
+    def fullmatch(self, string, pos: int, endpos: int, /) -> Optional[int]:
+        return self._run(string, pos, endpos, _FULLMATCH, set())
@@ -1,8 +1,43 @@
-from regex import compile, fullmatch, match, DEBUG
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import redirect_stdout
+from dataclasses import FrozenInstanceError
+from io import StringIO
+from mmap import mmap
+from os import listdir
+from pickle import dumps, loads
+from random import Random
+from tempfile import TemporaryDirectory, TemporaryFile
+from threading import Thread
+from tracemalloc import get_traced_memory, start, stop
+
+from regex import (compile, fullmatch, match, error, cache_info, purge,
+                   set_cache_size, enable_disk_cache, disable_disk_cache,
+                   set_limits, CODEGEN_THRESHOLD, DEBUG, ENGINES, I,
+                   MAXREPEAT, MEMO, LimitExceeded, Pattern)
+from regex.diskcache import DiskCache
 
 __all__ = [
     'test_compile',
     'test_match',
+    'test_debug_tracing',
+    'test_nfa_engine',
+    'test_repeat_errors',
+    'test_dfa_engine',
+    'test_pos_endpos',
+    'test_bytes',
+    'test_memo',
+    'test_vm_engine',
+    'test_codegen',
+    'test_match_many',
+    'test_charclass',
+    'test_fullmatch_array',
+    'test_compile_cache',
+    'test_disk_cache',
+    'test_threads',
+    'test_nodes',
+    'test_optimizer',
+    'test_possessive',
+    'test_limits',
 ]
 
 
@@ -64,3 +99,580 @@ def test_match():
     ]
 
     testfor(pattern, strings[2])
+
+
+def test_debug_tracing():
+    plain = compile(r'a+b')
+    traced = compile(r'a+b', DEBUG)
+
+    assert type(plain) is Pattern
+    assert type(traced) is not Pattern and isinstance(traced, Pattern)
+
+    output = StringIO()
+    with redirect_stdout(output):
+        assert plain.match('aab').span() == (0, 3)
+    assert output.getvalue() == ''
+
+    with redirect_stdout(output):
+        assert traced.match('aab').span() == (0, 3)
+    assert 'RUNNING: Pattern._match' in output.getvalue()
+
+
+def test_nfa_engine():
+    assert compile(r'a+b').engine == 'nfa'
+    assert compile(r'a+b', DEBUG).engine == 'backtrack'
+
+    compiled = compile(r'\w+ \d+?', engine='nfa')
+    assert compiled.match('peter_hunt 123').span() == (0, 12)
+    assert compiled.fullmatch('peter_hunt 123').span() == (0, 14)
+    assert compile(r'a{2,4}', engine='nfa').match('aaab').span() == (0, 3)
+    assert compile(r'\s\S+', engine='nfa').match('  foo') is None
+    assert compile(r'ab$', engine='nfa').match('abc') is None
+
+    # far beyond what the recursive backtracker can handle
+    assert compile(r'a+a+a+b', engine='nfa').match('a' * 5000) is None
+
+
+def test_repeat_errors():
+    for pattern in (r'a{3,1}', f'a{{{MAXREPEAT + 1}}}', r'a**', r'^*'):
+        try:
+            compile(pattern)
+        except error:
+            pass
+        else:
+            raise AssertionError(pattern)
+
+
+def test_dfa_engine():
+    compiled = compile(r'\w+ \d+?', engine='dfa')
+    assert compiled.match('peter_hunt 123').span() == (0, 12)
+    assert compiled.fullmatch('peter_hunt 123').span() == (0, 14)
+    assert compiled.match('peter_hunt') is None
+    assert compile(r'ab$', engine='dfa').match('abc') is None
+    assert compile(r'a*?$', engine='dfa').match('aaa').span() == (0, 3)
+
+    states = compiled.dfa.info()['states']
+    compiled.match('peter_hunt 123')
+    assert compiled.dfa.info()['states'] == states
+
+    # a cache too small for the pattern hands the calls back to the NFA
+    compiled = compile(r'.*a.{12}', engine='dfa', dfa_cache_size=20)
+    assert compiled.dfa.max_size == 20
+    choice = Random(0).choice
+    string = ''.join(choice('ab') for _ in range(2000))
+    expected = compile(r'.*a.{12}', engine='nfa').match(string).span()
+    for _ in range(3):
+        assert compiled.match(string).span() == expected
+    assert compiled.dfa.info()['failed']
+    assert not compile(r'.*a.{12}', engine='dfa').dfa.info()['failed']
+
+
+def test_pos_endpos():
+    for engine in ('backtrack', 'nfa', 'dfa'):
+        compiled = compile(r'\d+', engine=engine)
+        assert compiled.match('ab123cd', 2).span() == (2, 5)
+        assert compiled.match('ab123cd', 2, 4).span() == (2, 4)
+        assert compiled.fullmatch('ab123cd', 2, 5).span() == (2, 5)
+        assert compiled.fullmatch('ab123cd', 2) is None
+        assert compiled.match('ab123cd', 4, 2) is None
+        assert compile(r'^\d', engine=engine).match('ab123cd', 2) is None
+        assert compile(r'b$', engine=engine).match('abc', 1, 2).span() == (
+            1, 2,
+        )
+
+    # the input is never sliced while matching, so its length doesn't change
+    # the memory a match takes
+    def peak(string):
+        compiled = compile(r'ab\w', engine='backtrack')
+        start()
+        assert compiled.match(string).span() == (0, 3)
+        result = get_traced_memory()[1]
+        stop()
+        return result
+
+    assert peak('abc' * 350000) < peak('abc' * 350) * 2
+
+
+def test_bytes():
+    data = b'GET /a 200\nPOST /b 404\n'
+    for engine in ('backtrack', 'nfa', 'dfa'):
+        compiled = compile(rb'\d+\n', engine=engine)
+        assert compiled.search(data).span() == (7, 11)
+        assert compiled.findall(memoryview(data)) == [b'200\n', b'404\n']
+        for buffer in (memoryview(data), bytearray(data)):
+            assert all(type(found) is bytes
+                       for found in compiled.findall(buffer))
+            assert type(compiled.search(buffer).group()) is bytes
+        assert compile(rb'post\s.', I, engine=engine).search(
+            memoryview(data)
+        ).span() == (11, 17)
+        assert compile(rb'.', engine=engine).match(b'\n') is None
+
+        with TemporaryFile() as file:
+            file.write(data)
+            file.flush()
+            buffer = mmap(file.fileno(), 0)
+            assert [match.span() for match in compiled.finditer(buffer)] == [
+                (7, 11), (19, 23),
+            ]
+            buffer.close()
+
+        for pattern, string in ((rb'a', 'a'), ('a', b'a')):
+            try:
+                compile(pattern, engine=engine).match(string)
+            except TypeError:
+                pass
+            else:
+                raise AssertionError(pattern)
+
+
+def test_memo():
+    compiled = compile(r'a*a*a*a*a*a*c', MEMO)
+    assert compiled.engine == 'backtrack'
+    assert type(compiled) is not Pattern and isinstance(compiled, Pattern)
+
+    # exponential without the memo
+    assert compiled.match('a' * 60) is None
+    info = compiled.memo_info()
+    assert info['hits'] and 0 < info['hit_rate'] < 1
+
+    for pattern, string in ((r'\w+?\d{2,3}x', 'ab123x'), (r'a*b', 'aab')):
+        expected = compile(pattern, engine='backtrack').match(string).span()
+        assert compile(pattern, MEMO).match(string).span() == expected
+        assert compile(pattern, MEMO).fullmatch(string).span() == expected
+    assert compile(r'\d+', MEMO).findall('1 22 333') == ['1', '22', '333']
+
+    # the automata can neither trace nor memoize
+    for flags, engine in ((MEMO, 'vm'), (DEBUG, 'nfa'), (MEMO | DEBUG, 'dfa')):
+        try:
+            compile(r'a*a*c', flags, engine=engine)
+        except error:
+            pass
+        else:
+            raise AssertionError(engine)
+
+
+def test_vm_engine():
+    for pattern, string in ((r'\w+ \d+?', 'peter_hunt 123'),
+                            (r'a{2,4}?b', 'aaab'), (r'\s\S+$', 'ab  cd')):
+        expected = compile(pattern, engine='backtrack')
+        compiled = compile(pattern, engine='vm')
+        for method in ('match', 'fullmatch', 'search'):
+            result = getattr(compiled, method)(string)
+            reference = getattr(expected, method)(string)
+            assert (result and result.span()) == (
+                reference and reference.span()
+            )
+
+    # the backtrack stack is a list, not the Python stack
+    assert compile(r'a+a+a+b', engine='vm').match('a' * 5000) is None
+    assert compile(r'a*a*a*a*a*c', engine='vm').search('a' * 300) is None
+
+    program = compile(r'\d+x', engine='vm')._automaton
+    for copy in (loads(dumps(program)), type(program).loads(program.dumps())):
+        assert copy.code == program.code and copy.consts == program.consts
+        assert copy.match('12x', 0, 3) == 3
+
+
+def test_codegen():
+    strings = ['peter_hunt 123', 'ab  12', 'AB_9 ', '', 'x 1 2']
+    for pattern in (r'\w+ \d+?', r'\w*?\s{1,2}\d', r'^[a-z_]+\s*\d*$'):
+        expected = compile(pattern, I, engine='nfa')
+        compiled = compile(pattern, I, engine='backtrack')
+        assert compiled.source is None
+        for _ in range(CODEGEN_THRESHOLD):
+            compiled.match('')
+        assert compiled.source.startswith('def match(')
+        for string in strings + [string.upper() for string in strings]:
+            for method in ('match', 'fullmatch', 'search'):
+                result = getattr(compiled, method)(string)
+                reference = getattr(expected, method)(string)
+                assert (result and result.span()) == (
+                    reference and reference.span()
+                )
+
+    for flags in (DEBUG, MEMO):
+        compiled = compile(r'\d+', flags)
+        with redirect_stdout(StringIO()):
+            for _ in range(CODEGEN_THRESHOLD):
+                compiled.match('12')
+        assert compiled.source is None
+
+
+def test_match_many():
+    compiled = compile(r'\w+ \d+?', engine='dfa', dfa_cache_size=500)
+    # only what compile needs is pickled, not the nodes
+    data = dumps(compiled)
+    assert len(data) < 100 + len(compiled.raw) and b'PlainText' not in data
+    copy = loads(data)
+    assert copy == compiled and copy.dfa.max_size == 500
+    assert loads(dumps(copy)) is copy
+
+    strings = ['peter_hunt 123', 'x', 'ab 1 ', '12 3'] * 5
+    for workers in (1, 2):
+        for method in ('match', 'fullmatch'):
+            results = getattr(compiled, f'{method}_many')(strings, workers)
+            expected = [getattr(compiled, method)(string)
+                        for string in strings]
+            assert [result and result.span() for result in results] == [
+                result and result.span() for result in expected
+            ]
+    assert compiled.match_many([], 2) == []
+    try:
+        compiled.match_many(strings, 0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError
+
+
+def test_charclass():
+    for engine in ('backtrack', 'nfa', 'dfa', 'vm'):
+        assert compile(r'[a-z0-9_]+', engine=engine).match(
+            'ab_9-x'
+        ).span() == (0, 4)
+        assert compile(r'[^a-c]+', engine=engine).match('xyzab').span() == (
+            0, 3,
+        )
+        assert compile(r'[]\-]+', engine=engine).fullmatch(']-]')
+        assert compile(r'[A-Z]+', I, engine=engine).fullmatch('aBc')
+        assert compile(r'[^a]', I, engine=engine).match('A') is None
+        # str patterns take Unicode classes and bytes patterns ASCII ones
+        assert compile(r'\w+\s\d', engine=engine).fullmatch(
+            '\xe9t\u3000\u0663'
+        )
+        assert compile(r'\p{Lu}\P{Lu}', engine=engine).fullmatch('\xc0b')
+        assert compile(r'[\p{Ll}\d]+', engine=engine).fullmatch('a\xe91')
+        assert compile(rb'\w', engine=engine).match(b'\xe9') is None
+        assert compile(rb'[\x80-\xff]+', engine=engine).fullmatch(b'\xe9\xff')
+
+    # classes are built once and shared
+    first = compile(r'[a-f]x').nodes[0].table
+    assert compile(r'y[a-f]').nodes[1].table is first
+    assert loads(dumps(first)) is first
+    assert compile(r'[\d]').nodes[0].table is not compile(
+        rb'[\d]'
+    ).nodes[0].table
+
+    for pattern in ('[a', '[z-a]', r'[\q]', r'\p{Xx}', r'[\d-z]', rb'\p{L}'):
+        try:
+            compile(pattern)
+        except error:
+            pass
+        else:
+            raise AssertionError(pattern)
+
+
+def test_fullmatch_array():
+    try:
+        import numpy
+    except ImportError:
+        return
+
+    strings = ['2024-01-31', '2024-1-31', '2024-01-311', '', 'abcd-ef-gh',
+               '\u0662\u0660\u0662\u0664-01-31', '2024-01-3\n']
+    cases = [
+        (r'\d{4}-\d{2}-\d{2}', 0),
+        (r'^\d\d\d\d.\d\d.\d\d$', 0),
+        (r'[a-z]{4}-\w\w-\S{2}', 0),
+        (r'ABCD-EF-GH', I),
+        (r'\d+-\d+-\d+', 0),  # not fixed width, matched one by one
+        (r'', 0),
+    ]
+    array = numpy.array(strings)
+    for raw, flags in cases:
+        compiled = compile(raw, flags)
+        expected = [compiled.fullmatch(string) is not None
+                    for string in strings]
+        assert compiled.fullmatch_array(array).tolist() == expected
+        assert compiled.fullmatch_array(
+            array.reshape(7, 1)
+        ).tolist() == [[result] for result in expected]
+
+    byte_strings = [string.encode('latin-1', 'replace')
+                    for string in strings]
+    compiled = compile(rb'\d{4}-\d{2}-\d{2}')
+    assert compiled.fullmatch_array(numpy.array(byte_strings)).tolist() == [
+        compiled.fullmatch(string) is not None for string in byte_strings
+    ]
+
+
+def test_compile_cache():
+    max_size = cache_info()['max_size']
+    purge()
+    try:
+        set_cache_size(2)
+        first = compile('a')
+        assert compile('a') is first
+        compile('b')
+        # a hit makes a pattern the most recently used one
+        assert compile('a') is first
+        compile('c')
+        assert compile('a') is first
+        assert cache_info() == {'hits': 3, 'misses': 3, 'evictions': 1,
+                                'size': 2, 'max_size': 2}
+        assert compile(b'a') is not first
+        set_cache_size(0)
+        assert cache_info()['size'] == 0 and compile('a') is not first
+
+        try:
+            compile(['a'])
+        except TypeError:
+            pass
+        else:
+            raise AssertionError
+        try:
+            set_cache_size(-1)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError
+
+        set_cache_size(8)
+        purge()
+        patterns = [f'x{number}' for number in range(16)]
+
+        def churn():
+            for _ in range(50):
+                for pattern in patterns:
+                    assert compile(pattern).raw == pattern
+
+        threads = [Thread(target=churn) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        info = cache_info()
+        assert info['size'] == 8
+        assert info['hits'] + info['misses'] == 4 * 50 * 16
+    finally:
+        set_cache_size(max_size)
+        purge()
+
+
+def test_disk_cache():
+    patterns = [r'\w+ \d+?', r'[a-z\d]+\p{Lu}', rb'\x00\d{2}']
+    with TemporaryDirectory() as path:
+        purge()
+        enable_disk_cache(path)
+        try:
+            parsed = [compile(pattern, I) for pattern in patterns]
+            assert len(listdir(path)) == len(patterns) + 1  # and the lock
+            purge()
+            # loaded from the files, the same nodes on a new pattern
+            for pattern, expected in zip(patterns, parsed):
+                loaded = compile(pattern, I)
+                assert loaded is not expected and loaded == expected
+            assert compile(r'[a-z\d]+\p{Lu}', I).fullmatch('a1\xc9')
+        finally:
+            disable_disk_cache()
+            purge()
+
+        cache = DiskCache(path, '0.0.0')
+        assert cache.load(patterns[0], I) is None
+        cache.store(patterns[0], I, [])
+        assert cache.load(patterns[0], I) == []
+        assert cache.load(patterns[0], 0) is None
+
+
+def test_threads():
+    choice = Random(1).choice
+    strings = [''.join(choice('ab1 ') for _ in range(40)) for _ in range(200)]
+    patterns = [
+        compile(r'\w+ \d+?', engine=engine) for engine in ENGINES
+    ] + [compile(r'[ab]+1', engine='dfa', dfa_cache_size=8)]
+    expected = [[(result and result.span(), found and found.span())
+                 for result, found in zip(map(pattern.match, strings),
+                                          map(pattern.search, strings))]
+                for pattern in patterns]
+
+    # every thread shares the patterns and their DFA caches
+    def run(pattern):
+        return [(result and result.span(), found and found.span())
+                for result, found in zip(map(pattern.match, strings),
+                                         map(pattern.search, strings))]
+
+    with ThreadPoolExecutor(8) as executor:
+        for _ in range(3):
+            assert list(executor.map(run, patterns * 4)) == expected * 4
+
+    # racing threads generate the source once and lose no memo lookups
+    compiled = Pattern(r'\d+ms', compile(r'\d+ms').nodes)
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(compiled.search, ['took 125ms'] * 4000))
+    assert compiled.source is not None
+    memoized = compile(r'a*a*a*c', MEMO)
+    memoized.match('a' * 10)
+    lookups = memoized.memo_info()['hits'] + memoized.memo_info()['misses']
+    with ThreadPoolExecutor(8) as executor:
+        list(executor.map(memoized.match, ['a' * 10] * 400))
+    info = memoized.memo_info()
+    assert info['hits'] + info['misses'] == lookups * 401
+
+    # each call has its own trace, whatever other threads trace meanwhile
+    traced = compile(r'a+b', DEBUG)
+    output = StringIO()
+    with redirect_stdout(output):
+        traced.match('aab')
+    with redirect_stdout(StringIO()), ThreadPoolExecutor(4) as executor:
+        results = executor.map(lambda _: traced.match('aab').span(), range(8))
+        assert list(results) == [(0, 3)] * 8
+    output2 = StringIO()
+    with redirect_stdout(output2):
+        traced.match('aab')
+    assert output2.getvalue() == output.getvalue()
+
+
+def test_nodes():
+    nodes = compile(r'\d+\w.[a-z]{2}x*?', engine='backtrack').nodes
+    assert all(not hasattr(node, '__dict__') for node in nodes)
+    try:
+        nodes[1].flags = I
+    except FrozenInstanceError:
+        pass
+    else:
+        raise AssertionError
+    again = compile(r'\d+\w.[a-z]{2}x*?', engine='nfa').nodes
+    assert again == nodes and {*again} == {*nodes}
+    # leaves are shared by every pattern, also once unpickled
+    assert compile(r'a\w').nodes[1] is nodes[1]
+    assert loads(dumps(nodes)) == nodes and loads(dumps(nodes))[2] is nodes[2]
+    assert compile(r'\w', I).nodes[0] is not nodes[1]
+
+    compiled = compile(r'\w+@\w+\.com', engine='dfa')
+    before = compiled.memory_footprint()
+    assert set(before) == {'nodes', 'automaton', 'generated', 'total'}
+    assert before['total'] > before['nodes'] + before['automaton'] > 0
+    compiled.search('mail peter_hunt@example.com now')
+    # the DFA states are built by the search
+    assert compiled.memory_footprint()['automaton'] > before['automaton']
+
+
+def test_optimizer():
+    # repeats of one character are fused, literals kept apart from them
+    assert len(compile(r'a*a*a*a*b').nodes) == 2
+    assert len(compile(r'\d\d*\d?').nodes) == 1
+    assert compile(r'aa*b').nodes[0].value == 'a'
+    assert len(compile(r'a$b$c').nodes) == 3
+    # traces and memos keep the nodes as written
+    assert len(compile(r'a*a*', MEMO).nodes) == 2
+
+    rng = Random(5)
+    for _ in range(300):
+        atoms = [rng.choice(['a', 'ab', r'\w']) +
+                 rng.choice(['', '*', '+?', '?', '{2}', '{1,3}?'])
+                 for _ in range(rng.randint(1, 5))]
+        atoms.insert(rng.randint(0, len(atoms)), rng.choice(['', '^', '$']))
+        # the memo keeps the backtracker on the nodes as parsed
+        expected = compile(''.join(atoms), MEMO)
+        compiled = compile(''.join(atoms), engine='backtrack')
+        for _ in range(5):
+            string = ''.join(rng.choice('aab_') for _ in range(8))
+            for method in ('search', 'match', 'fullmatch'):
+                found = getattr(compiled, method)(string)
+                wanted = getattr(expected, method)(string)
+                assert (found and found.span()) == (wanted and wanted.span())
+
+
+def test_possessive():
+    for pattern, string, span in (
+        (r'a*+a', 'aaaa', None),
+        (r'a*+b', 'aaab', (0, 4)),
+        (r'\w++\w!', 'peter_hunt!', None),
+        (r'a{1,3}+a', 'aaaa', (0, 4)),
+        (r'a?+a', 'a', None),
+        (r'(?>a*)a', 'aaa', None),
+        (r'(?>a*?)b', 'ab', (1, 2)),
+        (r'x(?>\d+\w)y', 'x123y', None),
+        (r'(?>[)]+)x', ')x', (0, 2)),
+    ):
+        compiled = compile(pattern)
+        assert compiled.engine == 'backtrack'
+        found = compiled.search(string)
+        assert (found and found.span()) == span, pattern
+        found = compile(pattern, MEMO).search(string)
+        assert (found and found.span()) == span, pattern
+    assert compile(rb'(?>a+)b').search(b'zaab').span() == (1, 4)
+    # nothing to give back, so any engine can run them
+    assert compile(r'(?>ab\d)c').engine == 'nfa'
+
+    for pattern in (r'a*++', r'(?>a', r'(?>a)*'):
+        try:
+            compile(pattern)
+        except error:
+            pass
+        else:
+            raise AssertionError(pattern)
+    for engine in ('nfa', 'dfa', 'vm'):
+        try:
+            compile(r'\w++!', engine=engine)
+        except error:
+            pass
+        else:
+            raise AssertionError(engine)
+
+
+def test_limits():
+    compiled = compile(r'\w*\d*\w*\d*x', engine='backtrack')
+    string = '1234567890' * 20 + ' x'
+    for method in ('match', 'search', 'fullmatch'):
+        try:
+            getattr(compiled, method)(string, max_steps=1000)
+        except LimitExceeded as exc:
+            assert isinstance(exc, error) and exc.steps == 1001
+        else:
+            raise AssertionError(method)
+    try:
+        compiled.search(string * 10, timeout=0.01)
+    except LimitExceeded:
+        pass
+    else:
+        raise AssertionError
+
+    found = compile(r'a+b', engine='backtrack').search('xaab', max_steps=10)
+    assert found.span() == (1, 4) and 0 < found.steps <= 10
+    assert compile(r'a+b', engine='backtrack').search('xaab').steps is None
+    # the automata count their own steps
+    for engine in ('nfa', 'dfa', 'vm'):
+        compiled_engine = compile(r'\w+@\w+', engine=engine)
+        assert compiled_engine.search('a@b', max_steps=100).steps
+        try:
+            compiled_engine.search('ab ' * 1000 + '@', max_steps=100)
+        except LimitExceeded:
+            pass
+        else:
+            raise AssertionError(engine)
+
+    exc = loads(dumps(LimitExceeded('more than 5 steps', 6)))
+    assert str(exc) == 'more than 5 steps' and exc.steps == 6
+
+    set_limits(max_steps=1000)
+    try:
+        for method in ('search', 'findall'):
+            try:
+                getattr(compiled, method)(string)
+            except LimitExceeded:
+                pass
+            else:
+                raise AssertionError(method)
+        assert compile(r'a+b', engine='backtrack').search('xaab').steps
+        # workers raise it like the calling process does
+        try:
+            compiled.match_many([string] * 2, workers=2)
+        except LimitExceeded:
+            pass
+        else:
+            raise AssertionError
+    finally:
+        set_limits()
+    # generated source can't count its steps, limited calls walk the nodes
+    hot = compile(r'\w*\d*\w*\d*y', engine='backtrack')
+    for _ in range(CODEGEN_THRESHOLD):
+        hot.match('1y')
+    assert hot.source is not None
+    try:
+        hot.match(string, max_steps=1000)
+    except LimitExceeded:
+        pass
+    else:
+        raise AssertionError
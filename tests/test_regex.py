@@ -0,0 +1,202 @@
+from io import StringIO
+from timeit import repeat
+from tracemalloc import get_traced_memory, start, stop
+
+from regex import compile, findall, finditer, search, I, RegexSet
+
+__all__ = [
+    'test_search',
+    'test_dfa_search',
+    'test_finditer',
+    'test_finditer_stream',
+    'test_parallel_finditer',
+    'test_regex_set',
+    'test_match_object',
+]
+
+
+def fastest(func, argument):
+    # timings are only compared with each other, never with a fixed bound
+    return min(repeat(lambda: func(argument), number=1, repeat=5))
+
+
+def test_search():
+    for engine in ('backtrack', 'nfa', 'dfa'):
+        compiled = compile(r'ERROR \w+', engine=engine)
+        assert compiled.search('12:00 ERROR disk full').span() == (6, 16)
+        assert compiled.search('12:00 INFO ok') is None
+        assert compiled.search('ERROR a ERROR b', 1).span() == (8, 15)
+
+        compiled = compile(r'\d+ms', engine=engine)
+        assert compiled.search('took 125ms').span() == (5, 10)
+        assert compiled.search('took 125 s') is None
+
+        compiled = compile(r'^\d+', engine=engine)
+        assert compiled.search('12 ab').span() == (0, 2)
+        assert compiled.search('ab 12') is None
+        assert compiled.search('12 ab', 1) is None
+
+    assert search(r'a*?b', 'xxaab').span() == (2, 5)
+    assert search(r'\s$', 'a b ').span() == (3, 4)
+    assert search(r'x', '') is None
+
+
+def test_dfa_search():
+    compiled = compile(r'\w+\d', engine='dfa')
+    assert compiled.search('ab cd1 e2').span() == (3, 6)
+    assert compiled.search('x' * 50 + '1').span() == (0, 51)
+
+    # restarting the scan at every index would take quadratic steps here
+    string = 'a' * 20000
+    assert compiled.search(string, max_steps=len(string)) is None
+    assert not compiled.dfa.info()['failed']
+
+
+def test_finditer():
+    for engine in ('backtrack', 'nfa', 'dfa'):
+        compiled = compile(r'\d+', engine=engine)
+        matches = compiled.finditer('a1 22 333')
+        assert next(matches).span() == (1, 2)
+        assert [match.span() for match in matches] == [(3, 5), (6, 9)]
+        assert compiled.findall('a1 22 333', 2, 8) == ['22', '33']
+
+        # empty matches advance by one, like re
+        compiled = compile(r'a*', engine=engine)
+        assert [match.span() for match in compiled.finditer('baac')] == [
+            (0, 0), (1, 3), (3, 3), (4, 4),
+        ]
+        assert compile(r'\d*?', engine=engine).findall('12') == [
+            '', '1', '', '2', '',
+        ]
+
+        # every search starts where the last match ended, so ten times the
+        # input takes about ten times as long, not a hundred
+        scan = compile(r'a*b', engine=engine).findall
+        assert len(scan('ab' * 3000)) == 3000
+        assert fastest(scan, 'ab' * 3000) < fastest(scan, 'ab' * 300) * 30
+
+    assert findall(r'x', 'abc') == []
+    assert [match.group() for match in finditer(r'\s', 'a b')] == [' ']
+
+
+def test_finditer_stream():
+    text = 'id=12 id=345 x id=6'
+    for engine in ('backtrack', 'nfa', 'dfa'):
+        compiled = compile(r'id=\d+', engine=engine)
+        expected = [match.span() for match in compiled.finditer(text)]
+        for size in (1, 4, 100):
+            matches = compiled.finditer_stream(StringIO(text), size)
+            assert [match.span() for match in matches] == expected
+        chunks = ['id', '=1', '2 id=345 x', ' id=6']
+        assert [match.group()
+                for match in compiled.finditer_stream(chunks)] == [
+            'id=12', 'id=345', 'id=6',
+        ]
+        assert [match.span() for match in compile(
+            r'a*$', engine=engine,
+        ).finditer_stream(['ba', 'a'])] == [(1, 3), (3, 3)]
+
+    def peak(count):
+        start()
+        compiled = compile(r'\d+ ')
+        assert sum(1 for _ in compiled.finditer_stream(
+            'ab 12 ' * 10 for _ in range(count)
+        )) == count * 10
+        result = get_traced_memory()[1]
+        stop()
+        return result
+
+    assert peak(200) < peak(20) * 1.5
+
+
+def test_parallel_finditer():
+    text = 'id=12 id=345 x id=6 ' * 50 + 'aaaa' * 20
+    for pattern in (r'id=\d{1,3}', r'a{1,3}', r'\w{0,2}?\d', r'a??', r'\d+',
+                    r'^id', r'a*$'):
+        compiled = compile(pattern)
+        expected = [match.span() for match in compiled.finditer(text, 3)]
+        for workers in (2, 3, 7):
+            assert [match.span() for match in compiled.finditer(
+                text, 3, workers=workers,
+            )] == expected
+        assert compiled.findall(text, 3, workers=2) == [
+            text[start:end] for start, end in expected
+        ]
+    assert compile(rb'a{2}').findall(b'a' * 99, workers=4) == [b'aa'] * 49
+    try:
+        compile(r'a').findall(text, workers=0)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError
+
+
+def test_regex_set():
+    patterns = [r'/api/', r'/api/\w+/\d+$', r'/static/', r'\d+', r'^/$', '']
+    regex_set = RegexSet(patterns)
+    for path in ('/api/users/12', '/static/a.css', '/', '/api/x/1/y'):
+        for method in ('match', 'search'):
+            expected = [index for index, pattern in enumerate(patterns)
+                        if getattr(compile(pattern), method)(path)]
+            assert getattr(regex_set, f'{method}es')(path) == expected
+    assert regex_set.matches('/api/users/12', 5) == [5]
+    assert RegexSet(['he', 'she', 'hers'], I).searches('USHERS') == [0, 1, 2]
+    assert RegexSet([b'he', b'she', b'hers']).searches(b'ushers') == [0, 1, 2]
+    # a literal that is only a suffix of the text doesn't match at its start
+    assert RegexSet(['/api/users', 'users']).matches('/api/users') == [0]
+    assert RegexSet(['ba', 'a']).matches('ba') == [0]
+    assert RegexSet(['ba', 'a']).searches('ba') == [0, 1]
+
+    # one pass over the input whatever the number of patterns
+    def elapsed(count):
+        regex_set = RegexSet([f'/v{number}/\\w+' for number in range(count)]
+                             + [f'/static/{number}'
+                                for number in range(count)])
+        return fastest(lambda _: (regex_set.matches('/v2999/users'),
+                                  regex_set.searches('/static/12 /v7/a')),
+                       None)
+
+    regex_set = RegexSet([f'/v{number}/\\w+' for number in range(3000)]
+                         + [f'/static/{number}' for number in range(3000)])
+    assert regex_set.matches('/v2999/users') == [2999]
+    assert regex_set.searches('/static/12 /v7/a') == [7, 3001, 3012]
+    assert elapsed(3000) < elapsed(30) * 5
+
+
+def test_match_object():
+    compiled = compile(r'\d+')
+    string = 'ab 123 c'
+    match = compiled.search(string, 1, 7)
+    assert match.re is compiled and match.string is string
+    assert (match.pos, match.endpos) == (1, 7)
+    assert match.span() == (3, 6) and match.start() == 3 and match.end() == 6
+    assert match.group() == match.group(0) == match[0] == '123'
+    assert match.group(0, 0) == ('123', '123')
+    assert match.groups() == () and match.lastindex is None
+    assert repr(match) == "<regex.Match object; span=(3, 6), match='123'>"
+    for group in (1, -1, 'x'):
+        try:
+            match.group(group)
+        except IndexError:
+            pass
+        else:
+            raise AssertionError
+    assert not hasattr(match, '__dict__')
+
+    stream = compiled.finditer_stream(['ab 1', '23 c 4'])
+    assert [(match.span(), match.group(), match[0]) for match in stream] == [
+        ((3, 6), '123', '123'), ((9, 10), '4', '4'),
+    ]
+
+    # a match keeps offsets, not a copy of its text, so longer matches
+    # don't take more memory
+    def size(word):
+        text = f'{word} ' * 1000
+        start()
+        matches = list(compile(r'\w+', engine='backtrack').finditer(text))
+        result = get_traced_memory()[0]
+        stop()
+        assert len(matches) == 1000
+        return result
+
+    assert size('ab1' * 100) < size('ab1') * 1.5